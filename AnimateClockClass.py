@@ -7,10 +7,15 @@ from OpenGL.GLU import *
 from OpenGL.GLUT import *
 
 from OpenGL_2D_class_GLFW import gl2D, gl2DArrow, gl2DCircle
+from KeywordParser import KeywordParser
+from DataCache import codeVersion, loadCache, saveCache, sourceKey
 
 from HersheyFont import HersheyFont
 hf = HersheyFont()
 
+# bump this when the cached data changes meaning  (editing this file also invalidates the caches)
+CACHE_VERSION = 1
+
 
 
 class ClockAnimator():
@@ -31,32 +36,44 @@ class ClockAnimator():
         self.AnimReverse = False
         self.AnimRepeat = False
         self.AnimReset = True
+        self.useCache = True  # save/load the parsed data in a .cache.npz file next to the data file
 
 
     def ProcessFile(self, filename):
 
-        # Read the file
-        f1 = open(filename, 'r')  # open the file for reading
-        data = f1.readlines()  # read the entire file as a list of strings
-        f1.close()  # close the file  ... very important
-
-        for line in data:  # loop over all the lines
-            cells = line.strip().replace('(','').replace(')','').split(',')
-            keyword = cells[0].strip().lower()
-
-            if keyword == 'title': self.title = cells[1].replace("'", "")
-            if keyword == 'window':
-                self.xmin, self.xmax, self.ymin, self.ymax = \
-                    (float(cells[1]), float(cells[2]), float(cells[3]), float(cells[4]))
-
-            if keyword == 'radius':
-                    self.radius = float(cells[1])
-
-            if keyword == 'angles':
-                for i in range(1,len(cells)): #loop over all point pairs
-                    self.angles.append(float(cells[i]))
+        cacheFile = filename + '.cache.npz'
+        code = codeVersion(type(self), CACHE_VERSION)
+        if self.useCache:
+            cached = loadCache(cacheFile, filename, code)
+            if cached is not None:
+                info, arrays = cached
+                self.title = info['title']
+                self.radius = info['radius']
+                self.xmin, self.xmax, self.ymin, self.ymax = info['window']
+                self.angles = arrays['angles'].tolist()
+                self.ConnectData()
+                return
+
+        def title(cells): self.title = cells[1].replace("'", "")
+
+        def window(labels, v):
+            self.xmin, self.xmax, self.ymin, self.ymax = v[0], v[1], v[2], v[3]
+
+        def radius(labels, v): self.radius = v[0]
+        def angles(labels, v): self.angles.extend(v.tolist())
+
+        parser = KeywordParser()
+        parser.addText('title', title)
+        parser.addNumbers('window', window)
+        parser.addNumbers('radius', radius)
+        parser.addNumbers('angles', angles)
+        parser.parse(filename)  # one pass over the file
 
         self.ConnectData()
+        if self.useCache:
+            info = {'title': self.title, 'radius': self.radius,
+                    'window': [self.xmin, self.xmax, self.ymin, self.ymax]}
+            saveCache(cacheFile, sourceKey(filename, code), info, {'angles': np.asarray(self.angles)})
 
 
     def ConnectData(self):
@@ -75,12 +92,13 @@ class ClockAnimator():
         size = self.xmax / 8
         # draw the numbers
         glColor3f(0, 0, 0)  #
-        glLineWidth(3)
+        labels = []
         for i in range(1,13):
             theta = (90 - (360 * i / 12.0) )  * np.pi / 180
             xloc = (self.radius - size) * np.cos(theta)
             yloc = (self.radius - size) * np.sin(theta)
-            hf.drawText(str(i), xloc, yloc, center = True, scale=size)
+            labels.append((str(i), (xloc, yloc), size))
+        hf.drawTextBatch(labels, center = True, weight = 3)  # all twelve numbers in one draw call
 
         #draw the second hand
         glColor3f(1, 0, 0)  #
@@ -1,14 +1,29 @@
 import numpy as np
-from scipy.optimize import fsolve
 import time
 
 from OpenGL.GL import *
 from OpenGL.GLU import *
 from OpenGL.GLUT import *
 
-from OpenGL_2D_class_GLFW import gl2D, gl2DText, gl2DCircle
+from OpenGL_2D_class_GLFW import gl2D, gl2DText, gl2DCircle, gl2DCircles, gl2DJoints
+from OpenGL_2D_layer import gl2DLayer
+from KeywordParser import KeywordParser
+from DataCache import codeVersion, loadCache, saveCache, sourceKey
+from PackedShapes import PackedShapes, affineMatrix
 
 
+# bump this when the cached data changes meaning  (editing this file also invalidates the caches)
+CACHE_VERSION = 1
+
+
+# one row of the precomputed animation table
+# coupler is the 2x3 affine transform [R | t] that moves the coupler from its starting position
+FRAME_DTYPE = np.dtype([('th2', np.float64), ('th3', np.float64), ('th4', np.float64),
+                        ('ax', np.float64), ('ay', np.float64),
+                        ('bx', np.float64), ('by', np.float64),
+                        ('coupler', np.float64, (2, 3)),
+                        ('closes', np.bool_)])
+
 class Fourbar():
 
     def __init__(self):
@@ -62,19 +77,53 @@ class Fourbar():
 
 
     def SolvePositions(self):
-        def func(vals):
-            th3,th4 = vals
-            xerror=L1*np.cos(th1)+L2*np.cos(th2)+ \
-                    L3*np.cos(th3)+L4*np.cos(th4)
-            yerror=L1*np.sin(th1)+L2*np.sin(th2)+ \
-                    L3*np.sin(th3)+L4*np.sin(th4)
-            return xerror, yerror
-
+        # solve th3 and th4 for the current th2 using the closed form solution
+        # the old values are kept if the linkage can not be assembled at this th2
+        th3, th4, closes = self.SolveAllPositions(self.th2)
+        if closes:
+            (self.th3, self.th4) = (float(th3), float(th4))
+        return bool(closes)
+
+    def AssemblyBranch(self):
+        # which side of the line from a to b0 the pin b was on in the starting position
+        # +1 for the left side, -1 for the right side
+        dx, dy = self.b0x - self.axstart, self.b0y - self.aystart
+        l3x, l3y = np.cos(self.th3start), np.sin(self.th3start)
+        return -1.0 if (dx*l3y - dy*l3x) < 0 else 1.0
+
+    def CouplerMatrix(self):
+        # the 2x3 transform that moves the coupler (payloads, tracepoints) from its starting position
+        return affineMatrix(self.ax, self.ay, self.th3 - self.th3start, self.axstart, self.aystart)
+
+    def SolveAllPositions(self, theta2):
+        # closed form (circle intersection) position solution for an array of crank angles
+        # pin b is where the circle of radius L3 about a meets the circle of radius L4 about b0
+        # the assembly branch of th3start/th4start is kept for every crank angle
+        # returns th3, th4 and a boolean array that is False where the linkage can not close
+        # (th3 and th4 are NaN at those crank angles)
         L1,L2,L3,L4=self.L1,self.L2,self.L3,self.L4
-        th1=self.th1
-        th2=self.th2
-        (self.th3,self.th4) = fsolve(func,[self.th3,self.th4])
-        return
+        th2 = np.asarray(theta2, dtype=float)
+
+        # vector from the moving pin a to the fixed pivot b0
+        dx = -(L1*np.cos(self.th1) + L2*np.cos(th2))
+        dy = -(L1*np.sin(self.th1) + L2*np.sin(th2))
+        d = np.hypot(dx, dy)
+
+        tol = 1e-9*(L3 + L4)
+        closes = (d > 0) & (d <= L3 + L4 + tol) & (d >= np.abs(L3 - L4) - tol)
+
+        dsafe = np.where(d > 0, d, 1.0)
+        ux, uy = dx/dsafe, dy/dsafe
+        along = (d**2 + L3**2 - L4**2)/(2*dsafe)  #distance from a toward b0
+        h = np.sqrt(np.clip(L3**2 - along**2, 0, None))  #distance off that line
+        side = self.AssemblyBranch()
+
+        # link 3 vector (a to b) and link 4 vector (b to b0)
+        l3x = along*ux - side*h*uy
+        l3y = along*uy + side*h*ux
+        th3 = np.where(closes, np.arctan2(l3y, l3x), np.nan)
+        th4 = np.where(closes, np.arctan2(dy - l3y, dx - l3x), np.nan)
+        return th3, th4, closes
 
 class Geometry():
 
@@ -113,9 +162,11 @@ class FourbarAnimator():
         self.boundaries = []
         self.forcepoints = []
         self.tracepoints = []
-        self.tracepointLocations = []
-        self.tracepointAngles = []
-        self.tracepointJoints = []
+        self.tracepointLocations = []  # the path of each tracepoint, an (nframes, 2) polyline
+        self.tracepointAngles = []  # the coupler rotation (radians) at each point of the paths
+        self.tracepointJoints = []  # the paths of the coupler pins a and b
+        self.tracepointPaths = None  # all of the paths in one (ntracepoints, nframes, 2) array
+        self.tracepointFirstFrame = 0  # the paths start at the first frame where the linkage closes
         self.framenum = 0
         self.p1 = None
         self.p2 = None
@@ -138,94 +189,183 @@ class FourbarAnimator():
         self.reverseAngle = False
         self.showLinks=True
         self.showTracepoints = True
+        self.showTracepointPaths = True  # draw each tracepoint's path up to the current frame
+
+        self.precomputeFrames = True  # solve every animation frame once, right after ProcessFile
+        self.frameTable = None  # FRAME_DTYPE array, one row per animation frame
+        self.useCache = True  # save/load the designed fourbar in a .cache.npz file next to the data file
+
+        # payload outlines and tracepoints packed into one array, moved together every frame
+        self.packed = None
+        self.payloadIndex = []  # the packed shape index of each payload
+        self.tracepointIndex = None  # all of the tracepoints are one packed shape
+        self.ghosts = []  # the packed points in the second and third design positions
 
+        # the parts of the picture that don't move, recorded once  (see OpenGL_2D_layer.py)
+        self.backgroundLayer = gl2DLayer()
+        self.constructionLayer = gl2DLayer()
+        self.layerVersion = 0  # changes whenever the static parts need to be recorded again
 
 
     def ProcessFile(self, filename):
 
-        # Read the file
-        f1 = open(filename, 'r')  # open the file for reading
-        data = f1.readlines()  # read the entire file as a list of strings
-        f1.close()  # close the file  ... very important
+        cacheFile = filename + '.cache.npz'
+        code = codeVersion(type(self), CACHE_VERSION)
+        if self.useCache:
+            cached = loadCache(cacheFile, filename, code)
+            if cached is not None:
+                self.LoadFromCache(*cached)  # no parsing, design or solving needed
+                return
 
         self.fourbar = Fourbar()
         fb = self.fourbar
         self.construction = Construction()
 
-        for line in data:  # loop over all the lines
-
-            cells = line.strip().replace('(','').replace(')','').split(',')
-            keyword = cells[0].strip().lower()
-
-            if keyword == 'title': self.title = cells[1].replace("'", "")
-            if keyword == 'distance_unit': self.dist_unit = cells[1].replace("'", "")
-
-            if keyword == 'window':
-                self.xmin, self.xmax, self.ymin, self.ymax = \
-                    (float(cells[1]), float(cells[2]), float(cells[3]), float(cells[4]))
-
-            if keyword == 'connections':
-                fb.ax, fb.ay, fb.bx, fb.by = \
-                    (float(cells[1]), float(cells[2]), float(cells[3]), float(cells[4]))
-
-            if keyword == 'forcepoint':
-                name = cells[1].strip()
-                fpX = float(cells[2])
-                fpY = float(cells[3])
-                self.forcepoints.append([name, fpX, fpY])
-
-            if keyword == 'tracepoint':
-                name = cells[1].strip()
-                fpX = float(cells[2])
-                fpY = float(cells[3])
-                self.tracepoints.append([name, fpX, fpY])
-
-            if keyword == 'linestyle':
-                ls = LineStyle()
-                ls.name = cells[1].strip()
-                ls.rgb = (float(cells[2]), float(cells[3]), float(cells[4]))
-                ls.width = float(cells[5])
-                self.linestyles.append(ls)
-
-            if keyword == 'positions':
-                self.p1=(float(cells[1]), float(cells[2]))
-                self.p2=(float(cells[3]), float(cells[4]), float(cells[5]))
-                self.p3=(float(cells[6]), float(cells[7]), float(cells[8]))
-
-            if keyword == 'payload':
-                g = Geometry()
-                g.name = cells[1]
-                g.linestylename = cells[2].strip()
+        def title(cells): self.title = cells[1].replace("'", "")
+        def distance_unit(cells): self.dist_unit = cells[1].replace("'", "")
+
+        def window(labels, v):
+            self.xmin, self.xmax, self.ymin, self.ymax = v[0], v[1], v[2], v[3]
+
+        def connections(labels, v):
+            fb.ax, fb.ay, fb.bx, fb.by = v[0], v[1], v[2], v[3]
+
+        def forcepoint(labels, v): self.forcepoints.append([labels[0], v[0], v[1]])
+        def tracepoint(labels, v): self.tracepoints.append([labels[0], v[0], v[1]])
+
+        def linestyle(labels, v):
+            ls = LineStyle()
+            ls.name = labels[0]
+            ls.rgb = (v[0], v[1], v[2])
+            ls.width = v[3]
+            self.linestyles.append(ls)
+
+        def positions(labels, v):
+            self.p1=(v[0], v[1])
+            self.p2=(v[2], v[3], v[4])
+            self.p3=(v[5], v[6], v[7])
+
+        def geometry(labels, v):
+            g = Geometry()
+            g.name = labels[0]
+            g.linestylename = labels[1]
+            g.shape = v.reshape(-1, 2)  #all point pairs at once
+            return g
+
+        def payload(labels, v): self.payloads.append(geometry(labels, v))
+        def boundary(labels, v): self.boundaries.append(geometry(labels, v))
+
+        def showlinks(cells):
+            self.showLinks = cells[1].lower().strip() != "false"
+
+        def reversedAngle(cells):
+            self.reverseAngle = cells[1].lower().strip() == "true"
+
+        parser = KeywordParser()
+        parser.addText('title', title)
+        parser.addText('distance_unit', distance_unit)
+        parser.addNumbers('window', window)
+        parser.addNumbers('connections', connections)
+        parser.addNumbers('forcepoint', forcepoint, 1)
+        parser.addNumbers('tracepoint', tracepoint, 1)
+        parser.addNumbers('linestyle', linestyle, 1)
+        parser.addNumbers('positions', positions)
+        parser.addNumbers('payload', payload, 2)
+        parser.addNumbers('boundary', boundary, 2)
+        parser.addText('showlinks', showlinks)
+        parser.addText('reversed', reversedAngle)
+        parser.parse(filename)  # one pass over the file
 
-                for i in range(3,len(cells),2): #loop over all point pairs
-                    g.shape.append((float(cells[i]), float(cells[i+1])))
-                self.payloads.append(g)
-
-            if keyword == 'boundary':
+        self.ConnectFourbarData()
+        if self.precomputeFrames:
+            self.PrecomputeFrames()
+        if self.useCache:
+            self.SaveToCache(cacheFile, filename, code)
+
+
+    def SaveToCache(self, cacheFile, filename, code):
+        # small items go in a json string, shapes and the frame table as arrays
+        info = {'title': self.title, 'dist_unit': getattr(self, 'dist_unit', None),
+                'window': [self.xmin, self.xmax, self.ymin, self.ymax],
+                'p1': list(self.p1), 'p2': list(self.p2), 'p3': list(self.p3),
+                'showLinks': self.showLinks, 'reverseAngle': self.reverseAngle,
+                'linestyles': [[ls.name, list(ls.rgb), ls.width] for ls in self.linestyles],
+                'payloads': [[g.name, g.linestylename] for g in self.payloads],
+                'boundaries': [[g.name, g.linestylename] for g in self.boundaries],
+                'tracepoints': self.tracepoints, 'forcepoints': self.forcepoints,
+                'fourbar': {name: float(value) for name, value in vars(self.fourbar).items()},
+                'construction': {name: np.asarray(value).tolist() for name, value in vars(self.construction).items()}}
+        arrays = {}
+        for i, g in enumerate(self.payloads): arrays['payload_' + str(i)] = np.asarray(g.shape)
+        for i, g in enumerate(self.boundaries): arrays['boundary_' + str(i)] = np.asarray(g.shape)
+        if self.frameTable is not None: arrays['frameTable'] = self.frameTable
+        saveCache(cacheFile, sourceKey(filename, code), info, arrays)
+
+    def LoadFromCache(self, info, arrays):
+        self.title = info['title']
+        self.dist_unit = info['dist_unit']
+        self.xmin, self.xmax, self.ymin, self.ymax = info['window']
+        self.p1, self.p2, self.p3 = tuple(info['p1']), tuple(info['p2']), tuple(info['p3'])
+        self.showLinks = info['showLinks']
+        self.reverseAngle = info['reverseAngle']
+
+        for name, rgb, width in info['linestyles']:
+            ls = LineStyle()
+            ls.name = name
+            ls.rgb = tuple(rgb)
+            ls.width = width
+            self.linestyles.append(ls)
+        for kind, items, target in (('payload_', info['payloads'], self.payloads),
+                                    ('boundary_', info['boundaries'], self.boundaries)):
+            for i, (name, linestylename) in enumerate(items):
                 g = Geometry()
-                g.name = cells[1]
-                g.linestylename = cells[2].strip()
+                g.name = name
+                g.linestylename = linestylename
+                g.shape = arrays[kind + str(i)]
+                target.append(g)
+        self.tracepoints = info['tracepoints']
+        self.forcepoints = info['forcepoints']
+        self.LinkLineStyles()
+        self.PackGeometry()
 
-                for i in range(3,len(cells),2): #loop over all point pairs
-                    g.shape.append((float(cells[i]), float(cells[i+1])))
-                self.boundaries.append(g)
+        self.fourbar = Fourbar()
+        vars(self.fourbar).update(info['fourbar'])
+        self.construction = Construction()
+        vars(self.construction).update(info['construction'])
 
-            if keyword == 'showlinks':
-                if cells[1].lower().strip() == "false":
-                    self.showLinks = False
-                else:
-                    self.showLinks = True
+        table = arrays.get('frameTable')
+        if self.precomputeFrames:
+            if table is not None and len(table) == self.numberOfAnimationFrames:
+                self.frameTable = table
+                self.ComputeTracepointPaths()
+            else:
+                self.PrecomputeFrames()
 
-            if keyword == 'reversed':
-                if cells[1].lower().strip() == "true":
-                    self.reverseAngle = True
-                else:
-                    self.reverseAngle = False
 
-        self.ConnectFourbarData()
+    def SweepDesigns(self, candidates, workers=None, steps=90, weights=None, keepFailed=False, progress=None):
+        # design and rank a linkage for every candidate (ax, ay, bx, by) row, see FourbarSweep.py
+        # uses the positions, boundaries and payloads of the file loaded by ProcessFile
+        from FourbarSweep import sweepProblem, sweepDesigns
+        problem = sweepProblem(self, steps=steps, weights=weights)
+        return sweepDesigns(problem, candidates, workers=workers, keepFailed=keepFailed, progress=progress)
 
+    def ApplyDesign(self, row):
+        # use one row of the SweepDesigns() table (or any ax, ay, bx, by) as the moving pivots
+        self.fourbar = Fourbar()
+        fb = self.fourbar
+        self.construction = Construction()
+        (fb.ax, fb.ay, fb.bx, fb.by) = (float(row['ax']), float(row['ay']), float(row['bx']), float(row['by']))
+        self.DesignFourbar()
+        if self.precomputeFrames:
+            self.PrecomputeFrames()
 
     def ConnectFourbarData(self):
+        self.LinkLineStyles()
+        self.PackGeometry()
+        self.DesignFourbar()
+        #self.fourbar.LengthsAndAngles()
+
+    def LinkLineStyles(self):
         #connect drawing objects  with linestyle information
         default = LineStyle()
         default.name = 'default'
@@ -242,8 +382,21 @@ class FourbarAnimator():
                     b.linestyle = ls
             if b.linestyle is None: b.linestyle = default
 
-        self.DesignFourbar()
-        #self.fourbar.LengthsAndAngles()
+    def PackGeometry(self):
+        # pack everything that rides on the coupler, and place the design position ghosts once
+        self.packed = PackedShapes()
+        self.payloadIndex = [self.packed.add(p.shape) for p in self.payloads]
+        self.tracepointIndex = self.packed.add([[tp[1], tp[2]] for tp in self.tracepoints])
+        pref = self.p1
+        self.ghosts = [self.packed.transform(affineMatrix(pnew[0], pnew[1], pnew[2]*np.pi/180, pref[0], pref[1]),
+                                             out=np.empty_like(self.packed.pack()))
+                       for pnew in (self.p2, self.p3)]
+        self.InvalidateLayers()
+
+    def MovedGeometry(self):
+        # the packed points in every animation frame, an (nframes, npoints, 2) array
+        if self.frameTable is None: self.PrecomputeFrames()
+        return self.packed.transformAll(self.frameTable['coupler'])
 
     def SetToStartingPosition(self):
         #reset the mechanism to the starting position
@@ -265,6 +418,10 @@ class FourbarAnimator():
         if self.fourbar is None: return  #nothing to draw
 
         fb=self.fourbar
+        key = (self.layerVersion, self.xmin, self.xmax)  # record the static layers again if these change
+
+        # the parts that never move are recorded once and replayed every frame
+        self.backgroundLayer.draw(self.DrawBackground, key)
 
         # Draw the fourbar links
 
@@ -287,84 +444,65 @@ class FourbarAnimator():
             glVertex2f(fb.bx, fb.by)
             glEnd()
 
-            # draw the fourbar joints
+            # draw the fourbar joints ... one instanced draw call for each kind
             jointsize = float(self.xmax - self.xmin)/100.0
             glLineWidth(1.5)
-            glColor3f(0.0, 0, 0)
-            gl2DCircle(fb.a0x, fb.a0y, jointsize, fill=True)
-            gl2DCircle(fb.b0x, fb.b0y, jointsize, fill=True)
-            glColor3f(1.0, 1, 1)
-            gl2DCircle(fb.a0x, fb.a0y, 0.8*jointsize, fill=True)
-            gl2DCircle(fb.b0x, fb.b0y, 0.8*jointsize, fill=True)
-            glColor3f(0.8, 1, 0.5)
-            gl2DCircle(fb.ax, fb.ay, 0.5*jointsize, fill=True)
-            gl2DCircle(fb.bx, fb.by, 0.5*jointsize, fill=True)
+            gl2DJoints([fb.a0x, fb.b0x], [fb.a0y, fb.b0y], jointsize, color=(1, 1, 1), edgeColor=(0, 0, 0))
+            gl2DCircles([fb.ax, fb.bx], [fb.ay, fb.by], 0.5*jointsize, color=(0.8, 1, 0.5), fill=True)
+
+        # move all of the payloads and tracepoints at once
+        moved = self.packed.transform(fb.CouplerMatrix())
 
         if self.showTracepoints:
+            # draw the tracepoint paths, from the precomputed polylines, up to the current frame
+            paths = self.tracepointPaths
+            if self.showTracepointPaths and paths is not None and paths.size > 0:
+                nframes = paths.shape[1]
+                first = self.tracepointFirstFrame
+                count = min(self.framenum + 1, nframes) - first
+                if count > 0:
+                    glLineWidth(1.5)
+                    glColor3f(0, 0.6, 0.6)
+                    glEnableClientState(GL_VERTEX_ARRAY)
+                    glVertexPointer(2, GL_DOUBLE, 0, paths)
+                    for i in range(len(paths)):
+                        glDrawArrays(GL_LINE_STRIP, i*nframes + first, count)
+                    glDisableClientState(GL_VERTEX_ARRAY)
+
             # draw the tracepoints
             jointsize = float(self.xmax - self.xmin)/100.0
             glLineWidth(1.5)
             glColor3f(0, 1, 1)
-            for  tp in range(len(self.tracepoints)):
-                x = self.tracepoints[tp][1]
-                y = self.tracepoints[tp][2]
-                newpoint = transform([[x, y]], fb.ax, fb.ay, (fb.th3 - fb.th3start),
-                                               fb.axstart,fb.aystart)
-                gl2DCircle(newpoint[0][0],newpoint[0][1] ,jointsize*0.7, fill=True)
-
-            # #draw the moving payload
-            # rgb = p.linestyle.rgb
-            # glLineWidth(1.5)
-            # glColor3f(rgb[0],rgb[1],rgb[2])
-            # glBegin(GL_LINE_STRIP)  # begin drawing connected lines
-            # pref=self.p1
-            # pnew = self.p2
-            # for point in transform(p.shape,fb.ax,fb.ay,(fb.th3-fb.th3start),
-            #                        fb.axstart,fb.aystart):
-            #     glVertex2f(point[0], point[1])
-            # glEnd()
-            #
-
-
-        # draw the payloads
-        for p in self.payloads:
-
-            glColor3f(0.85,0.85,0.85)
-            #draw the untransformed payload (first postion)
-            glBegin(GL_LINE_STRIP)  # begin drawing connected lines
-            for point in p.shape:
-                glVertex2f(point[0], point[1])
-            glEnd()
+            points = moved[self.packed.slice(self.tracepointIndex)]
+            gl2DCircles(points[:, 0], points[:, 1], jointsize*0.7, fill=True)
 
-            #draw the payload in the second postion
-            glBegin(GL_LINE_STRIP)  # begin drawing connected lines
-            pref=self.p1
-            pnew = self.p2
-            for point in transform(p.shape,pnew[0],pnew[1],pnew[2]*np.pi/180,pref[0],pref[1]):
-                glVertex2f(point[0], point[1])
-            glEnd()
+        #draw the moving payloads
+        glLineWidth(1.5)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        for p, i in zip(self.payloads, self.payloadIndex):
+            rgb = p.linestyle.rgb
+            glColor3f(rgb[0],rgb[1],rgb[2])
+            drawLineStrips(moved, self.packed, [i])
+        glDisableClientState(GL_VERTEX_ARRAY)
 
-            #draw the payload in the third postion
-            glBegin(GL_LINE_STRIP)  # begin drawing connected lines
-            pref=self.p1
-            pnew = self.p3
-            for point in transform(p.shape,pnew[0],pnew[1],pnew[2]*np.pi/180,pref[0],pref[1]):
-                glVertex2f(point[0], point[1])
-            glEnd()
+        # draw the construction lines
+        if self.constructionOn is True:
+            self.constructionLayer.draw(self.DrawConstruction, key)
 
+        return
 
-            #draw the moving payload
-            rgb = p.linestyle.rgb
-            glLineWidth(1.5)
-            glColor3f(rgb[0],rgb[1],rgb[2])
-            glBegin(GL_LINE_STRIP)  # begin drawing connected lines
-            pref=self.p1
-            pnew = self.p2
-            for point in transform(p.shape,fb.ax,fb.ay,(fb.th3-fb.th3start),
-                                   fb.axstart,fb.aystart):
-                glVertex2f(point[0], point[1])
-            glEnd()
+    def InvalidateLayers(self):
+        # the data changed, record the static layers again
+        self.layerVersion += 1
 
+    def DrawBackground(self):
+        # the static part of the picture: the payload in the three design positions, and the boundaries
+        glLineWidth(1.5)
+        glColor3f(0.85,0.85,0.85)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        for points in [self.packed.points] + self.ghosts:
+            drawLineStrips(points, self.packed, self.payloadIndex)
+        glDisableClientState(GL_VERTEX_ARRAY)
 
         # draw the boundaries
         for b in self.boundaries:
@@ -376,46 +514,119 @@ class FourbarAnimator():
                 glVertex2f(point[0], point[1])
             glEnd()
 
-        # draw the construction lines
-        if self.constructionOn is True:
-            cs = self.construction
-            rgb = [1,0.7,0.7]
-            glLineWidth(1.5)
-            glColor3f(rgb[0],rgb[1],rgb[2])
-            glBegin(GL_LINE_STRIP)  # begin drawing connected lines
-            glVertex2f(fb.a0x, fb.a0y)
-            glVertex2f(cs.a[0],cs.a[1])
-            glVertex2f(cs.amid[0],cs.amid[1])
-            glVertex2f(fb.a0x, fb.a0y)
-            glVertex2f(cs.afinal[0],cs.afinal[1])
-            glVertex2f(cs.amid[0],cs.amid[1])
-            glEnd()
-
-            glColor3f(1,1,1)
-            glEnable(GL_LINE_STIPPLE)  # enable a dashed line
-            glLineStipple(1, 0x00FF)  # the value for dashed lines
-            glBegin(GL_LINE_STRIP)  # begin drawing connected lines
-            glVertex2f((cs.a[0]+cs.amid[0])/2,(cs.a[1]+cs.amid[1])/2)
-            glVertex2f(fb.a0x, fb.a0y)
-            glVertex2f((cs.afinal[0]+cs.amid[0])/2,(cs.afinal[1]+cs.amid[1])/2)
-            glEnd()
-            glDisable(GL_LINE_STIPPLE)  # disable the dashed line
-
-            circlesize = float(self.xmax - self.xmin)/100.0
-            gl2DCircle(cs.a[0],cs.a[1], circlesize, fill=True)
-            gl2DCircle(cs.amid[0],cs.amid[1],circlesize,fill= True)
-            gl2DCircle(cs.afinal[0],cs.afinal[1],circlesize,fill= True)
-            gl2DCircle(fb.a0x, fb.a0y,circlesize,fill= True)
-            glColor3f(0,0,0)
-            gl2DCircle(fb.a0x, fb.a0y,0.8*circlesize,fill= True)
-
-
-        return
-
+    def DrawConstruction(self):
+        fb = self.fourbar
+        cs = self.construction
+        rgb = [1,0.7,0.7]
+        glLineWidth(1.5)
+        glColor3f(rgb[0],rgb[1],rgb[2])
+        glBegin(GL_LINE_STRIP)  # begin drawing connected lines
+        glVertex2f(fb.a0x, fb.a0y)
+        glVertex2f(cs.a[0],cs.a[1])
+        glVertex2f(cs.amid[0],cs.amid[1])
+        glVertex2f(fb.a0x, fb.a0y)
+        glVertex2f(cs.afinal[0],cs.afinal[1])
+        glVertex2f(cs.amid[0],cs.amid[1])
+        glEnd()
+
+        glColor3f(1,1,1)
+        glEnable(GL_LINE_STIPPLE)  # enable a dashed line
+        glLineStipple(1, 0x00FF)  # the value for dashed lines
+        glBegin(GL_LINE_STRIP)  # begin drawing connected lines
+        glVertex2f((cs.a[0]+cs.amid[0])/2,(cs.a[1]+cs.amid[1])/2)
+        glVertex2f(fb.a0x, fb.a0y)
+        glVertex2f((cs.afinal[0]+cs.amid[0])/2,(cs.afinal[1]+cs.amid[1])/2)
+        glEnd()
+        glDisable(GL_LINE_STIPPLE)  # disable the dashed line
+
+        circlesize = float(self.xmax - self.xmin)/100.0
+        gl2DCircles([cs.a[0], cs.amid[0], cs.afinal[0], fb.a0x], [cs.a[1], cs.amid[1], cs.afinal[1], fb.a0y],
+                    circlesize, fill=True)
+        glColor3f(0,0,0)
+        gl2DCircle(fb.a0x, fb.a0y,0.8*circlesize,fill= True)
+
+
+    def PrecomputeFrames(self, nframes=None):
+        # solve every animation frame in one call and store the poses in self.frameTable
+        fb = self.fourbar
+        if nframes is None: nframes = self.numberOfAnimationFrames
+
+        th2 = fb.theta2start + (fb.theta2end-fb.theta2start) * np.arange(nframes)/max(nframes-1, 1)
+        th3, th4, closes = fb.SolveAllPositions(th2)
+
+        table = np.zeros(nframes, dtype=FRAME_DTYPE)
+        table['th2'] = th2
+        table['th3'] = th3
+        table['th4'] = th4
+        table['ax'] = fb.a0x + fb.L2*np.cos(th2)
+        table['ay'] = fb.a0y + fb.L2*np.sin(th2)
+        table['bx'] = table['ax'] + fb.L3*np.cos(th3)
+        table['by'] = table['ay'] + fb.L3*np.sin(th3)
+
+        # coupler rotation about (axstart, aystart) followed by a move to (ax, ay)
+        c = np.cos(th3 - fb.th3start)
+        s = np.sin(th3 - fb.th3start)
+        table['coupler'][:, 0, 0] = c
+        table['coupler'][:, 0, 1] = -s
+        table['coupler'][:, 1, 0] = s
+        table['coupler'][:, 1, 1] = c
+        table['coupler'][:, 0, 2] = table['ax'] - (c*fb.axstart - s*fb.aystart)
+        table['coupler'][:, 1, 2] = table['ay'] - (s*fb.axstart + c*fb.aystart)
+        table['closes'] = closes
+
+        self.frameTable = table
+        self.ComputeTracepointPaths()
+        return table
+
+    def ComputeTracepointPaths(self):
+        # the coupler curve of every tracepoint over the whole motion, all in one pass
+        table = self.frameTable
+        paths = self.packed.transformAll(table['coupler'], self.tracepointIndex)  # (nframes, ntracepoints, 2)
+        closes = table['closes']
+        first = int(np.argmax(closes)) if closes.any() else len(table)
+        if first < len(table) and not np.all(closes):
+            # hold the last good position where the linkage can't close (just like SetFrame)
+            # the frames before the first good one have nothing to hold, they are left out of the drawing
+            good = np.maximum.accumulate(np.where(closes, np.arange(len(table)), first))
+            paths = paths[good]
+        self.tracepointFirstFrame = first
+        self.tracepointPaths = np.ascontiguousarray(np.swapaxes(paths, 0, 1))
+        self.tracepointLocations = list(self.tracepointPaths)
+        angles = table['th3'] - self.fourbar.th3start
+        self.tracepointAngles = [angles for tp in self.tracepoints]
+        self.tracepointJoints = [np.stack([table['ax'], table['ay']], axis=1),
+                                 np.stack([table['bx'], table['by']], axis=1)]
+
+    def ExportTracepointPaths(self, filename):
+        # the tracepoint paths as a csv file: frame, theta2 (degrees), then x and y for every tracepoint
+        # frames where the linkage can't close are left empty
+        if self.frameTable is None: self.PrecomputeFrames()
+        table = self.frameTable
+        columns = [np.arange(len(table)), np.degrees(table['th2'])]
+        header = ['frame', 'theta2']
+        for tp, path in zip(self.tracepoints, self.tracepointLocations):
+            columns += [np.where(table['closes'], path[:, 0], np.nan), np.where(table['closes'], path[:, 1], np.nan)]
+            header += [tp[0] + ' x', tp[0] + ' y']
+        with open(filename, 'w') as f1:
+            f1.write(','.join(header) + '\n')
+            for row in np.stack(columns, axis=1):
+                f1.write(','.join('' if np.isnan(v) else '{:.6g}'.format(v) for v in row) + '\n')
+
+    def SetFrame(self, row):
+        # copy one row of the frame table into the fourbar
+        if not row['closes']: return  # keep the last good pose
+        fb = self.fourbar
+        fb.th2, fb.th3, fb.th4 = float(row['th2']), float(row['th3']), float(row['th4'])
+        fb.ax, fb.ay = float(row['ax']), float(row['ay'])
+        fb.bx, fb.by = float(row['bx']), float(row['by'])
 
     def AnimationCallback(self, frame, nframes):
         fb=self.fourbar
         self.framenum = frame
+        table = self.frameTable
+        if table is not None and len(table) == nframes and 0 <= frame < nframes:
+            self.SetFrame(table[frame])  # no solving needed
+            return
         if frame == 0: #use the original theta data
             fb.th2 = fb.theta2start
             fb.th3 = fb.th3start
@@ -479,27 +690,46 @@ class FourbarAnimator():
         cs.bfinal = bfinal
 
         fb.LengthsAndAngles()
+        self.InvalidateLayers()
 
 
 def bisect(p1,p2,p3):
-
-    def func(vals): #the "root function" for use  with fsolve()
-        k1,k2 = vals
-        error1 = (c12[0] + k1*r12[0]) - (c13[0] + k2*r13[0])
-        error2 = (c12[1] + k1*r12[1]) - (c13[1] + k2*r13[1])
-        return (error1, error2)
-
-    #Centers
-    c12=np.array([p2[0]+p1[0],p2[1]+p1[1]])/2
-    c13=np.array([p3[0]+p1[0],p3[1]+p1[1]])/2
-    #Rotated vectors
-    r12=np.array([-(p2[1]-p1[1]),p2[0]-p1[0]])
-    r13=np.array([-(p3[1]-p1[1]),p3[0]-p1[0]])
-    #call fsolve to get k-values that produce an intersection
-    k1,k2 = fsolve(func,(1,1))
-    bx = c12[0] + k1*r12[0]
-    by = c12[1] + k1*r12[1]
-    return [bx,by]
+    # the fixed pivot that moves a pin through p1, p2 and p3:
+    # where the perpendicular bisectors of p1-p2 and p1-p3 meet  (the circumcenter)
+    center, ok = circumcenter(p1, p2, p3)
+    if not ok:
+        raise ValueError("the three pin locations are in a straight line, there is no fixed pivot")
+    return [center[0], center[1]]
+
+
+def circumcenter(p1, p2, p3, tol=1e-12):
+    # closed form circumcenters of any number of point triples
+    # p1, p2, p3 are (..., 2) arrays of x,y values
+    # returns (centers, ok) ... ok is False (and the center is NaN) where the points are collinear
+    p1 = np.asarray(p1, dtype=float)
+    b = np.asarray(p2, dtype=float) - p1  # work relative to p1 for better accuracy
+    c = np.asarray(p3, dtype=float) - p1
+    bb = b[..., 0]**2 + b[..., 1]**2
+    cc = c[..., 0]**2 + c[..., 1]**2
+    d = 2*(b[..., 0]*c[..., 1] - b[..., 1]*c[..., 0])  # zero for collinear points
+
+    ok = np.abs(d) > tol*np.maximum(bb, cc)
+    dsafe = np.where(ok, d, 1.0)
+    center = np.empty(np.broadcast(b, c).shape)
+    center[..., 0] = (c[..., 1]*bb - b[..., 1]*cc)/dsafe
+    center[..., 1] = (b[..., 0]*cc - c[..., 0]*bb)/dsafe
+    center = center + p1
+    center[~ok] = np.nan
+    return center, ok
+
+
+def drawLineStrips(points, packed, shapes):
+    # draw packed shapes as line strips straight from the (npoints, 2) array
+    # GL_VERTEX_ARRAY must be enabled
+    glVertexPointer(2, GL_DOUBLE, 0, points)
+    for i in shapes:
+        if packed.count[i] > 1:
+            glDrawArrays(GL_LINE_STRIP, int(packed.first[i]), int(packed.count[i]))
 
 
 def transform(points,xnew,ynew, theta = 0, xref = 0, yref = 0):
@@ -1,3 +1,7 @@
+import ctypes
+import json
+import os
+import warnings
 import numpy as np
 from scipy.optimize import fsolve
 import time
@@ -6,11 +10,18 @@ from OpenGL.GL import *
 from OpenGL.GLU import *
 from OpenGL.GLUT import *
 
-from OpenGL_2D_class_GLFW import gl2D, gl2DArrow, gl2DCircle
+from OpenGL_2D_class_GLFW import gl2D, gl2DArrow, gl2DCircles
+from OpenGL_2D_shader import createShaderProgram
+from ColorMap import temperatures_to_rgb, make_lut, NAN_COLOR
+from KeywordParser import KeywordParser
+from DataCache import codeVersion, keyIsCurrent, sourceKey
 
 from HersheyFont import HersheyFont
 hf = HersheyFont()
 
+# bump this when the cached data changes meaning  (editing this file also invalidates the caches)
+CACHE_VERSION = 1
+
 
 
 class TemperatureAnimator():
@@ -28,6 +39,9 @@ class TemperatureAnimator():
         self.ymin = 0
         self.ymax = 0
         self.allowDistortion = False
+        self.colormap = 'rainbow'  # any name from ColorMap.COLORMAPS
+        self.useShader = True  # color the cells on the GPU, falls back to gl2DCircles() if shaders fail
+        self.fieldShader = None  # TemperatureFieldShader, created on the first draw
 
         self.numberOfAnimationFrames  = None
         self.AnimDelayTime = 0.05
@@ -37,29 +51,104 @@ class TemperatureAnimator():
 
 
     def ProcessFile(self, filename):
-        # from the array of strings, fill the wing dictionary
-        # Read the file
-        f1 = open(filename, 'r')  # open the file for reading
-        data = f1.readlines()  # read the entire file as a list of strings
-        f1.close()  # close the file  ... very important
-
-        for line in data:  # loop over all the lines
-            cells = line.strip().replace('(','').replace(')','').split(',')
-            keyword = cells[0].strip().lower()
-
-            if keyword == 'title': self.title = cells[1].replace("'", "")
-
-            if keyword == 'range':
-                self.tMin = float(cells[1])
-                self.tMax = float(cells[2])
+        # the rows are parsed only once, into a binary .npy file next to the data file
+        # after that the file is memory mapped and rows are only read from disk when they are drawn
+        # the .json file holds the other keywords and the DataCache key (content hash and code version)
+        cacheFile = filename + '.rows.npy'
+        infoFile = filename + '.rows.json'
+        code = codeVersion(type(self), CACHE_VERSION)
+        if not self.LoadRowCache(filename, cacheFile, infoFile, code):
+            self.ParseFile(filename, cacheFile, infoFile, code)
+        self.ConnectData()
 
-            if keyword == 'row':
-                temps = []
-                for i in range(1,len(cells)): #loop over all temperatures on the row
-                    temps.append(float(cells[i]))
-                self.Temperatures.append(temps)
 
-        self.ConnectData()
+    def ParseFile(self, filename, cacheFile, infoFile, code):
+        counts = {'rows': 0, 'rowSize': 0}
+
+        def title(cells): self.title = cells[1].replace("'", "")
+
+        def tRange(labels, v):
+            self.tMin = v[0]
+            self.tMax = v[1]
+
+        def countRow(text):
+            if counts['rows'] == 0:  # every row must have as many temperatures as the first one
+                counts['rowSize'] = len([cell for cell in text.split(',') if cell.strip()])
+            counts['rows'] += 1
+
+        # first pass: the keywords, and how many rows there are
+        parser = KeywordParser()
+        parser.addText('title', title)
+        parser.addNumbers('range', tRange)
+        parser.addRaw('row', countRow)
+        parser.parse(filename)
+        nRows, rowSize = counts['rows'], counts['rowSize']
+
+        # second pass: the temperatures go straight into a temporary .npy file, which replaces
+        # the cache only when it is complete (like DataCache.saveCache) ... a viewer that still has
+        # the old cache memory mapped keeps its copy, and a failed parse leaves no half written cache
+        tmpFile = '{}.{}.tmp.npy'.format(cacheFile, os.getpid())
+        try:
+            temps = np.lib.format.open_memmap(tmpFile, mode='w+', dtype=np.float32, shape=(nRows, rowSize))
+        except OSError:  # can't write next to the data file, keep it in memory
+            temps = np.empty((nRows, rowSize), dtype=np.float32)
+            tmpFile = None
+
+        def row(labels, v):
+            if len(v) != rowSize:  # KeywordParser adds the line number
+                raise ValueError('this row has {} temperatures, the first row has {}'.format(len(v), rowSize))
+            temps[counts['filled']] = v
+            counts['filled'] += 1
+
+        counts['filled'] = 0
+        parser = KeywordParser()
+        parser.addNumbers('row', row)
+        try:
+            parser.parse(filename)
+        except BaseException:
+            if tmpFile is not None:
+                del temps
+                os.remove(tmpFile)
+            raise
+
+        if tmpFile is None:
+            self.Temperatures = temps
+            return
+        temps.flush()
+        del temps
+        info = {'key': sourceKey(filename, code),
+                'title': self.title, 'tMin': self.tMin, 'tMax': self.tMax}
+        tmpInfo = '{}.{}.tmp'.format(infoFile, os.getpid())
+        try:
+            os.replace(tmpFile, cacheFile)
+        except OSError:  # can't replace the cache, keep the rows in memory
+            self.Temperatures = np.load(tmpFile)
+            os.remove(tmpFile)
+            return
+        try:
+            with open(tmpInfo, 'w') as f1:
+                json.dump(info, f1)
+            os.replace(tmpInfo, infoFile)  # only once the cache it describes is in place
+        except OSError:
+            pass  # without the .json the cache is simply made again next time
+        self.Temperatures = np.load(cacheFile, mmap_mode='r')
+
+
+    def LoadRowCache(self, filename, cacheFile, infoFile, code):
+        # use the .npy file if it was made from this data file by this version of the code
+        try:
+            with open(infoFile, 'r') as f1:
+                info = json.load(f1)
+            if not keyIsCurrent(info.get('key'), filename, code):
+                return False
+            temps = np.load(cacheFile, mmap_mode='r')
+        except (OSError, ValueError, KeyError):
+            return False
+        self.title = info['title']
+        self.tMin = info['tMin']
+        self.tMax = info['tMax']
+        self.Temperatures = temps
+        return True
 
 
     def ConnectData(self):
@@ -86,10 +175,20 @@ class TemperatureAnimator():
         size = self.xmax / 8
         # draw the numbers
 
-        for i in range(self.rowSize): #draw the actual temperatures
-            colors = temperature_to_rgb(temps[i],self.tMin,self.tMax)
-            glColor3f(*colors)  #
-            gl2DCircle(i*self.spacing, self.ymin, self.spacing/3,fill=True)
+        #draw the actual temperatures
+        if self.useShader and self.fieldShader is None:
+            try:
+                self.fieldShader = TemperatureFieldShader(self)
+            except Exception as error:  # no GLSL 1.30 or float textures ... draw on the CPU instead
+                warnings.warn("Temperature shader not available, drawing on the CPU: {}".format(error))
+                self.useShader = False
+
+        if self.useShader:
+            self.fieldShader.draw(self.thisRow)  # only the frame number changes
+        else:
+            colors = temperatures_to_rgb(temps, self.tMin, self.tMax, self.colormap)  # the whole row at once
+            # one instanced draw call for every cell, only the colors change from frame to frame
+            gl2DCircles(np.arange(self.rowSize)*self.spacing, self.ymin, self.spacing/3, colors, fill=True)
 
         glColor3f(1, 1, 1)
         hf.drawText("Temperature Values", (self.xmax + self.xmin) / 2, self.ymin + self.spacing *1.2,
@@ -122,46 +221,173 @@ class TemperatureAnimator():
         self.thisRow = frame
 
 
-def temperature_to_rgb(temp, t_min, t_max):
+class TemperatureFieldShader():
+    # draws the temperature cells with the colormap done in a GLSL shader
+    # a window of rows (frames) around the current one is uploaded as a float texture, and the cell
+    # geometry once as a vertex buffer, so changing frames is a single uniform change until the
+    # animation leaves the window ... only the rows in the window are ever read from the (memory mapped) file
+
+    VERTEX_SHADER = """
+    #version 130
+    in vec2 position;
+    in float node;
+    uniform sampler2D temperatures;
+    uniform int frame;
+    uniform int nodes;
+    uniform int texWidth;
+    uniform float tMin;
+    uniform float tMax;
+    flat out float tNorm;
+
+    void main() {
+        int i = frame * nodes + int(node);
+        float t = texelFetch(temperatures, ivec2(i % texWidth, i / texWidth), 0).r;
+        tNorm = isnan(t) ? -1.0 : clamp((t - tMin) / (tMax - tMin), 0.0, 1.0);  // -1 is a missing value
+        gl_Position = gl_ModelViewProjectionMatrix * vec4(position, 0.0, 1.0);
+    }
     """
-    Maps a temperature value to an RGB color.
-    Blue = t_min, Green = middle, Red = t_max
+
+    FRAGMENT_SHADER = """
+    #version 130
+    flat in float tNorm;
+    uniform sampler1D colormap;
+    uniform float lutSize;
+    uniform vec3 nanColor;
+
+    void main() {
+        float x = (tNorm * (lutSize - 1.0) + 0.5) / lutSize;  // texel centers of the lookup table
+        gl_FragColor = vec4(tNorm < 0.0 ? nanColor : texture(colormap, x).rgb, 1.0);
+    }
     """
-    if t_min >= t_max:
-        raise ValueError("t_min must be less than t_max")
-
-    # Normalize temperature to range [0, 1]
-    t_norm = (temp - t_min) / (t_max - t_min)
-
-    if t_norm <= 0.25:
-        # Blue (0,0,1) → Cyan (0,1,1)
-        ratio = t_norm / 0.25
-        r = 0.0
-        g = ratio
-        b = 1.0
-
-    elif t_norm <= 0.5:
-        # Cyan (0,1,1) → Green (0,1,0)
-        ratio = (t_norm - 0.25) / 0.25
-        r = 0.0
-        g = 1.0
-        b = 1.0 - ratio
-
-    elif t_norm <= 0.75:
-        # Green (0,1,0) → Yellow (1,1,0)
-        ratio = (t_norm - 0.5) / 0.25
-        r = ratio
-        g = 1.0
-        b = 0.0
-
-    else:
-        # Yellow (1,1,0) → Red (1,0,0)
-        ratio = (t_norm - 0.75) / 0.25
-        r = 1.0
-        g = 1.0 - ratio
-        b = 0.0
-
-    return (r, g, b)
+
+    WINDOW_VALUES = 1 << 22  # temperatures kept on the GPU at a time (16 MB)
+
+    def __init__(self, animator, faces=24):
+        self.program = None
+        self.dataTexture = None
+        self.lutTexture = None
+        self.vbo = None
+        try:
+            self.create(animator, faces)
+        except Exception:
+            self.delete()  # free whatever was made before the failure
+            raise
+
+    def create(self, animator, faces):
+        self.program = createShaderProgram(self.VERTEX_SHADER, self.FRAGMENT_SHADER)
+        self.temperatures = animator.Temperatures  # may be memory mapped, rows are read as they are needed
+        self.nodes = animator.rowSize
+        self.tMin = animator.tMin
+        self.tMax = animator.tMax
+
+        # a window of whole rows, as one flat float texture wrapped to fit the maximum texture width
+        maxSize = int(glGetIntegerv(GL_MAX_TEXTURE_SIZE))
+        self.windowRows = max(1, min(len(self.temperatures), self.WINDOW_VALUES // max(self.nodes, 1)))
+        values = self.windowRows * self.nodes
+        self.texWidth = max(1, min(values, maxSize))
+        self.texHeight = -(-values // self.texWidth)
+        if self.texHeight > maxSize:
+            raise RuntimeError("one row of temperatures is too large for a texture")
+        self.windowStart = None  # first row in the texture, None until the first upload
+
+        self.dataTexture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.dataTexture)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_R32F, self.texWidth, self.texHeight, 0, GL_RED, GL_FLOAT, None)
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+        # the colormap lookup table
+        lut = make_lut(animator.colormap)
+        self.lutSize = len(lut)
+        self.lutTexture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_1D, self.lutTexture)
+        glTexParameteri(GL_TEXTURE_1D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_1D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_1D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexImage1D(GL_TEXTURE_1D, 0, GL_RGB32F, self.lutSize, 0, GL_RGB, GL_FLOAT, np.ascontiguousarray(lut))
+        glBindTexture(GL_TEXTURE_1D, 0)
+
+        # one filled circle (a fan of triangles) per node:  x, y, node number
+        theta = np.linspace(0, 2*np.pi, faces + 1)
+        xc = np.arange(self.nodes, dtype=np.float32) * animator.spacing
+        radius = animator.spacing / 3
+        tris = np.empty((self.nodes, faces, 3, 3), dtype=np.float32)
+        tris[:, :, 0, 0] = xc[:, None]
+        tris[:, :, 0, 1] = animator.ymin
+        tris[:, :, 1, 0] = xc[:, None] + radius*np.cos(theta[:-1])
+        tris[:, :, 1, 1] = animator.ymin + radius*np.sin(theta[:-1])
+        tris[:, :, 2, 0] = xc[:, None] + radius*np.cos(theta[1:])
+        tris[:, :, 2, 1] = animator.ymin + radius*np.sin(theta[1:])
+        tris[:, :, :, 2] = np.arange(self.nodes, dtype=np.float32)[:, None, None]
+        vertices = np.ascontiguousarray(tris.reshape(-1, 3))
+        self.count = len(vertices)
+
+        self.vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        program = self.program
+        self.uniforms = {name: glGetUniformLocation(program, name) for name in
+                         ('temperatures', 'colormap', 'frame', 'nodes', 'texWidth', 'tMin', 'tMax', 'lutSize', 'nanColor')}
+
+    def delete(self):
+        # free the GPU objects  (needs the GL context to be current)
+        if self.vbo is not None: glDeleteBuffers(1, [self.vbo])
+        for texture in (self.dataTexture, self.lutTexture):
+            if texture is not None: glDeleteTextures([texture])
+        if self.program is not None: glDeleteProgram(self.program)
+        self.program = self.dataTexture = self.lutTexture = self.vbo = None
+
+    def uploadWindow(self, frame):
+        # move the window so it holds frame, with a quarter of it before frame (for reverse playback)
+        start = max(0, min(frame - self.windowRows // 4, len(self.temperatures) - self.windowRows))
+        rows = np.asarray(self.temperatures[start:start + self.windowRows], dtype=np.float32)
+        piece = np.zeros(self.texWidth * self.texHeight, dtype=np.float32)
+        piece[:rows.size] = rows.reshape(-1)
+        glBindTexture(GL_TEXTURE_2D, self.dataTexture)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+        glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, self.texWidth, self.texHeight, GL_RED, GL_FLOAT, piece)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        self.windowStart = start
+
+    def draw(self, frame):
+        frame = int(frame)
+        if self.windowStart is None or not self.windowStart <= frame < self.windowStart + self.windowRows:
+            self.uploadWindow(frame)
+
+        u = self.uniforms
+        glUseProgram(self.program)
+        glUniform1i(u['frame'], frame - self.windowStart)  # row within the window
+        glUniform1i(u['nodes'], self.nodes)
+        glUniform1i(u['texWidth'], self.texWidth)
+        glUniform1f(u['tMin'], self.tMin)
+        glUniform1f(u['tMax'], self.tMax)
+        glUniform1f(u['lutSize'], self.lutSize)
+        glUniform3f(u['nanColor'], *NAN_COLOR)
+        glUniform1i(u['temperatures'], 0)
+        glUniform1i(u['colormap'], 1)
+
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, self.dataTexture)
+        glActiveTexture(GL_TEXTURE1)
+        glBindTexture(GL_TEXTURE_1D, self.lutTexture)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glEnableVertexAttribArray(0)
+        glEnableVertexAttribArray(1)
+        glVertexAttribPointer(0, 2, GL_FLOAT, GL_FALSE, 12, ctypes.c_void_p(0))  # position
+        glVertexAttribPointer(1, 1, GL_FLOAT, GL_FALSE, 12, ctypes.c_void_p(8))  # node
+        glDrawArrays(GL_TRIANGLES, 0, self.count)
+        glDisableVertexAttribArray(1)
+        glDisableVertexAttribArray(0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        glBindTexture(GL_TEXTURE_1D, 0)
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        glUseProgram(0)
 
 
 def drawTemperatureColorBarHorizontal(xmin,xmax,ymin,ymax):
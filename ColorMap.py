@@ -0,0 +1,99 @@
+'''
+Shared temperature (or any scalar) to color mapping
+    temperatures_to_rgb() colors a single value, a row or a whole 2D array in one NumPy call
+    by indexing a precomputed lookup table (LUT).
+    Colormaps are lists of evenly spaced RGB stops.  "rainbow" is the original
+    Blue → Cyan → Green → Yellow → Red ramp.  Add your own with register_colormap().
+'''
+
+import numpy as np
+
+
+COLORMAPS = {
+    'rainbow': [(0, 0, 1), (0, 1, 1), (0, 1, 0), (1, 1, 0), (1, 0, 0)],
+    'grayscale': [(0, 0, 0), (1, 1, 1)],
+    'hot': [(0, 0, 0), (1, 0, 0), (1, 1, 0), (1, 1, 1)],
+    'coolwarm': [(0.23, 0.30, 0.75), (0.87, 0.87, 0.87), (0.71, 0.02, 0.15)],
+}
+
+lut_cache = {}  # (colormap name, size) -> (size, 3) float32 lookup table
+NAN_COLOR = (0.5, 0.5, 0.5)  # missing values are gray
+
+
+def register_colormap(name, stops):
+    """
+    Adds (or replaces) a colormap.
+    stops is a list of at least two RGB colors, evenly spaced from t_min to t_max
+    """
+    stops = np.asarray(stops, dtype=np.float32)
+    if stops.ndim != 2 or stops.shape[1] != 3 or len(stops) < 2:
+        raise ValueError("a colormap needs at least two RGB stops")
+    COLORMAPS[name] = stops
+    for key in [key for key in lut_cache if key[0] == name]:
+        del lut_cache[key]  # rebuild the lookup tables for this name
+
+
+def colormap_stops(name):
+    if name not in COLORMAPS:
+        raise ValueError("unknown colormap: " + str(name))
+    return np.asarray(COLORMAPS[name], dtype=np.float32)
+
+
+def make_lut(name='rainbow', size=1024):
+    """
+    The (size, 3) lookup table for a colormap, built once and then cached
+    """
+    key = (name, size)
+    if key not in lut_cache:
+        stops = colormap_stops(name)
+        positions = np.linspace(0, 1, len(stops))
+        x = np.linspace(0, 1, size)
+        lut = np.empty((size, 3), dtype=np.float32)
+        for c in range(3):
+            lut[:, c] = np.interp(x, positions, stops[:, c])
+        lut_cache[key] = lut
+    return lut_cache[key]
+
+
+def temperatures_to_rgb(temps, t_min, t_max, colormap='rainbow', lut_size=1024, under=None, over=None,
+                        nan=NAN_COLOR):
+    """
+    Maps an array of temperatures (any shape) to RGB colors with shape temps.shape + (3,)
+    Values below t_min or above t_max are clamped to the end colors,
+    unless an under or over color is given for them.
+    Missing values (NaN) get the nan color.
+    """
+    if t_min >= t_max:
+        raise ValueError("t_min must be less than t_max")
+
+    temps = np.asarray(temps, dtype=np.float64)
+    lut = make_lut(colormap, lut_size)
+
+    # Normalize temperature to range [0, 1] and look up the colors
+    t_norm = (temps - t_min) / (t_max - t_min)
+    missing = np.isnan(t_norm)
+    index = np.rint(np.clip(np.where(missing, 0.0, t_norm), 0.0, 1.0) * (lut_size - 1)).astype(np.intp)
+    colors = lut[index]
+    colors[missing] = nan
+
+    if under is not None:
+        colors[t_norm < 0] = under
+    if over is not None:
+        colors[t_norm > 1] = over
+    return colors
+
+
+def temperature_to_rgb(temp, t_min, t_max, colormap='rainbow', nan=NAN_COLOR):
+    """
+    Maps one temperature value to an RGB color tuple.
+    Blue = t_min, Green = middle, Red = t_max   (exact, without the lookup table)
+    """
+    if t_min >= t_max:
+        raise ValueError("t_min must be less than t_max")
+    if np.isnan(temp):
+        return tuple(float(c) for c in nan)
+
+    stops = colormap_stops(colormap)
+    positions = np.linspace(0, 1, len(stops))
+    t_norm = min(max((temp - t_min) / (t_max - t_min), 0.0), 1.0)
+    return tuple(float(np.interp(t_norm, positions, stops[:, c])) for c in range(3))
@@ -73,9 +73,7 @@ class main_window(QDialog):
         self.myAnimator.AnimationCallback(frame, nframes)
         self.ui.horizontalSlider_frame.setValue(frame)
         self.ui.Frame_Number.setText(str(frame))
-        # the next line is absolutely required for pause, resume, stop, etc !!!
-        app.processEvents()
-        pass
+        # no app.processEvents() needed, frames are drawn from the Qt event loop
 
 
     def assign_widgets(self):  # callbacks for Widgets on your GUI
@@ -98,6 +96,7 @@ class main_window(QDialog):
             if len(filename) == 0:
                 no_file()
                 return
+        self.glwindow1.glStopAnimation()  # the running animation belongs to the old file
         self.ui.textEdit_filename.setText(filename)
         app.processEvents()
         QApplication.setOverrideCursor(QCursor(Qt.WaitCursor))
@@ -131,6 +130,7 @@ class main_window(QDialog):
 
     def glFrameSlider(self):  # I used a slider to control manual animation
         frameval = int(self.ui.horizontalSlider_frame.value())
+        self.glwindow1.glSeekAnimation(frameval)  # a running animation continues from here
         self.AnimationCallback(frameval, self.myAnimator.numberOfAnimationFrames)
         self.ui.Frame_Number.setText(str(frameval))
         self.glwindow1.glUpdate()  # update the GL image
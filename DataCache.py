@@ -0,0 +1,94 @@
+'''
+Binary sidecar caches for the animators' data files
+    After a data file has been parsed (and, for four-bars, designed and solved) the results are
+    saved next to it, e.g.  "Landing Gear Design.txt.cache.npz".  Reopening the same file loads
+    the cache instead of parsing it again.
+
+    A cache is only used if its key still matches:
+        - the SHA-256 hash of the data file's contents
+          (the size and modification time are checked first, so unchanged files are not re-hashed)
+        - the code version: the animator's version number plus a hash of its source file and of
+          KeywordParser.py, PackedShapes.py and DataCache.py, so changing the code that parses the
+          file or writes the cache also throws the old caches away
+'''
+
+import hashlib
+import inspect
+import json
+import os
+import zipfile
+import numpy as np
+
+
+def fileHash(filename, blocksize=1 << 20):
+    h = hashlib.sha256()
+    with open(filename, 'rb') as f1:
+        for block in iter(lambda: f1.read(blocksize), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+# the shared modules whose code also shapes what goes into a cache
+SHARED_SOURCES = ('KeywordParser.py', 'PackedShapes.py', 'DataCache.py')
+
+
+def codeVersion(animatorClass, version):
+    # the animator's own version number plus a hash of the file it is defined in
+    # and of the shared parsing and caching modules
+    here = os.path.dirname(os.path.abspath(__file__))
+    h = hashlib.sha256()
+    try:
+        sources = [inspect.getsourcefile(animatorClass)]
+        sources += [os.path.join(here, name) for name in SHARED_SOURCES]
+        for source in sources:
+            h.update(fileHash(source).encode())
+        codeHash = h.hexdigest()[:16]
+    except (TypeError, OSError):
+        codeHash = 'unknown'
+    return str(version) + '-' + codeHash
+
+
+def sourceKey(filename, code):
+    # everything needed to decide later if a cache still belongs to this file and this code
+    stat = os.stat(filename)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': fileHash(filename), 'code': code}
+
+
+def keyIsCurrent(key, filename, code):
+    try:
+        if key['code'] != code: return False
+        stat = os.stat(filename)
+        if key['size'] != stat.st_size: return False
+        if key['mtime'] == stat.st_mtime_ns: return True  # unchanged, no need to hash
+        return key['hash'] == fileHash(filename)  # touched, but is the content the same?
+    except (OSError, KeyError, TypeError):
+        return False
+
+
+def saveCache(cacheFile, key, info, arrays=None):
+    # info is anything json can store, arrays is a dictionary of NumPy arrays
+    # written to a temporary file first, so a half written cache is never loaded
+    if arrays is None: arrays = {}
+    # one temporary file per process, several processes (export and sweep workers) may save at once
+    tmpFile = '{}.{}.tmp.npz'.format(cacheFile, os.getpid())
+    try:
+        np.savez(tmpFile, _key=np.array(json.dumps(key)), _info=np.array(json.dumps(info)), **arrays)
+        os.replace(tmpFile, cacheFile)
+    except OSError:
+        return False  # can't write next to the data file ... no cache then
+    finally:
+        if os.path.exists(tmpFile): os.remove(tmpFile)  # only left over if something failed
+    return True
+
+
+def loadCache(cacheFile, filename, code):
+    # returns (info, arrays) or None if there is no current cache
+    try:
+        with np.load(cacheFile, allow_pickle=False) as npz:
+            key = json.loads(str(npz['_key']))
+            if not keyIsCurrent(key, filename, code): return None
+            info = json.loads(str(npz['_info']))
+            arrays = {name: npz[name] for name in npz.files if name not in ('_key', '_info')}
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):  # missing, old or damaged
+        return None
+    return info, arrays
@@ -0,0 +1,179 @@
+'''
+Export an animation to a video (MP4), an animated GIF or a sequence of PNG files
+    Any animator class (FourbarAnimator, TemperatureAnimator, ClockAnimator) can be exported:
+        exportAnimation(FourbarAnimator, "Landing Gear Design.txt", "Landing Gear.mp4")
+
+    The frames are split into chunks that are drawn by a pool of worker processes.
+    The data file is read (and cached) once before the pool starts, then every worker loads it
+    and draws its frames with an offscreen gl2D (no window needed).  The chunks come back in order and are streamed into the encoder,
+    so export speed grows with the number of CPU cores instead of being tied to playback speed.
+
+    MP4 and GIF files need the imageio package (2.28 or later, and imageio-ffmpeg for MP4).
+    PNG sequences use imageio if it is installed, otherwise Pillow.
+'''
+
+import multiprocessing
+import os
+import sys
+
+
+# one animator and one offscreen gl2D per worker process
+workerAnimator = None
+workerWindow = None
+
+
+def initWorker(animatorClass, filename, width, height):
+    # runs once in every worker process
+    # PYOPENGL_PLATFORM is already set, so it is safe to import OpenGL now
+    global workerAnimator, workerWindow
+    from OpenGL_2D_class_GLFW import gl2D
+
+    anim = animatorClass()
+    anim.ProcessFile(filename)
+    window = gl2D(None, anim.DrawPicture, windowType="offscreen", width=width, height=height)
+    window.setViewSize(anim.xmin, anim.xmax, anim.ymin, anim.ymax, anim.allowDistortion)
+    workerAnimator = anim
+    workerWindow = window
+
+
+def renderFrames(frames):
+    # draw a chunk of frames, returns a list of (height, width, 3) uint8 arrays
+    anim = workerAnimator
+    return [workerWindow.glRenderFrame(anim.AnimationCallback, frame, anim.numberOfAnimationFrames)
+            for frame in frames]
+
+
+class frameWriter():
+    # a small wrapper so that videos, GIFs and PNG sequences are written the same way
+
+    def __init__(self, output, fps=30):
+        self.output = output
+        self.fps = fps
+        self.count = 0
+        self.writer = None
+        self.pngPattern = None
+
+        extension = os.path.splitext(output)[1].lower()
+        if extension == ".png":
+            # "frames/frame.png" becomes frames/frame_00000.png, frames/frame_00001.png, ...
+            # or use a pattern such as "frames/frame_{:04d}.png"
+            if "{" in output:
+                self.pngPattern = output
+            else:
+                self.pngPattern = output[:-len(extension)] + "_{:05d}" + extension
+            folder = os.path.dirname(self.pngPattern)
+            if folder: os.makedirs(folder, exist_ok=True)
+        elif extension in (".gif", ".mp4", ".avi", ".mov", ".mkv"):
+            try:
+                import imageio
+            except ImportError:
+                raise RuntimeError("Exporting " + extension + " files needs the imageio package")
+            if extension == ".gif":
+                # imageio (2.28 and later, through Pillow) takes the GIF frame duration in milliseconds
+                self.writer = imageio.get_writer(output, mode="I", duration=1000.0 / fps)
+            else:
+                self.writer = imageio.get_writer(output, fps=fps)
+        else:
+            raise ValueError("Unknown export file type: " + output)
+
+    def append(self, image):
+        if self.writer is not None:
+            self.writer.append_data(image)
+        else:
+            writePNG(self.pngPattern.format(self.count), image)
+        self.count += 1
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+def writePNG(filename, image):
+    try:
+        import imageio
+        imageio.imwrite(filename, image)
+    except ImportError:
+        from PIL import Image
+        Image.fromarray(image).save(filename)
+
+
+def exportAnimation(animatorClass, filename, output, width=1200, height=600, fps=30,
+                    frames=None, workers=None, chunksize=16, platform="egl", progress=None):
+    # animatorClass - the class, not an instance  (e.g. FourbarAnimator)
+    # filename - the data file to animate
+    # output - a .mp4, .gif or .png file name
+    # frames - the frame numbers to export, all of the frames if None
+    # workers - number of processes, one per CPU core if None
+    # platform - "egl" or "osmesa", the offscreen OpenGL used by the workers
+    # progress - optional function called as progress(frames done, total frames)
+    # returns the number of frames written
+
+    # read the file once here, before the workers start, so a data cache is already written
+    # and the workers only load it  (no worker sees a half written cache)
+    anim = animatorClass()
+    anim.ProcessFile(filename)
+    if frames is None:
+        frames = range(anim.numberOfAnimationFrames)
+    frames = list(frames)
+    if workers is None: workers = os.cpu_count() or 1
+    chunks = [frames[i:i + chunksize] for i in range(0, len(frames), chunksize)]
+
+    # the workers must pick the offscreen platform before they import OpenGL
+    # "spawn" starts them fresh, and they copy the environment when the pool is created
+    context = multiprocessing.get_context("spawn")
+    oldPlatform = os.environ.get("PYOPENGL_PLATFORM")
+    os.environ["PYOPENGL_PLATFORM"] = platform
+    try:
+        pool = context.Pool(workers, initializer=initWorker,
+                            initargs=(animatorClass, filename, width, height))
+    finally:
+        if oldPlatform is None:
+            del os.environ["PYOPENGL_PLATFORM"]
+        else:
+            os.environ["PYOPENGL_PLATFORM"] = oldPlatform
+
+    writer = frameWriter(output, fps)
+    try:
+        with pool:
+            for images in pool.imap(renderFrames, chunks):  # in order, while other chunks are drawn
+                for image in images:
+                    writer.append(image)
+                if progress is not None:
+                    progress(writer.count, len(frames))
+    finally:
+        writer.close()
+    return writer.count
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Export an animation to MP4, GIF or PNG files")
+    parser.add_argument("animator", choices=["fourbar", "temperature", "clock"])
+    parser.add_argument("filename", help="the data file to animate")
+    parser.add_argument("output", help="a .mp4, .gif or .png file name")
+    parser.add_argument("--width", type=int, default=1200)
+    parser.add_argument("--height", type=int, default=600)
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--platform", choices=["egl", "osmesa"], default="egl")
+    args = parser.parse_args()
+
+    if args.animator == "fourbar":
+        from AnimateFourbarClass import FourbarAnimator as animatorClass
+    elif args.animator == "temperature":
+        from AnimateTemperatureClass import TemperatureAnimator as animatorClass
+    else:
+        from AnimateClockClass import ClockAnimator as animatorClass
+
+    def report(done, total):
+        sys.stdout.write("\r{} of {} frames".format(done, total))
+        sys.stdout.flush()
+
+    count = exportAnimation(animatorClass, args.filename, args.output, args.width, args.height, args.fps,
+                            workers=args.workers, platform=args.platform, progress=report)
+    print("\nWrote", count, "frames to", args.output)
+
+
+if __name__ == "__main__":
+    main()
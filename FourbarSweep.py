@@ -0,0 +1,292 @@
+'''
+Design space sweep for three position four-bar synthesis
+    FourbarAnimator.DesignFourbar() designs ONE linkage from the "connections" line of a data file.
+    sweepDesigns() designs thousands (or millions) of them at once, one for every candidate pair of
+    moving pivots a and b, and ranks them:
+
+        anim = FourbarAnimator()
+        anim.ProcessFile("Landing Gear Design.txt")
+        candidates = randomCandidates(aBox=(2, 4, 1, 4), bBox=(1, 3, 0, 2), count=1000000)
+        table = anim.SweepDesigns(candidates)
+        anim.ApplyDesign(table[0])  # the best one
+
+    For every candidate the fixed pivots are synthesized (all candidates in one NumPy call),
+    then the linkage is checked over the whole theta2 range:
+        assembles     - it closes at every crank angle AND reaches the mid and final positions
+                        without changing assembly branch (no taking it apart half way)
+        ratio         - longest link / shortest link  (1 is best)
+        transmission  - the worst transmission angle in degrees  (90 is best)
+        clearance     - the closest the links and payloads come to the boundaries
+    The candidates are split into chunks that are scored by a pool of worker processes.
+'''
+
+import multiprocessing
+import os
+import numpy as np
+
+from AnimateFourbarClass import circumcenter, transform
+
+
+# one row of the ranked results table
+SWEEP_DTYPE = np.dtype([('ax', np.float64), ('ay', np.float64), ('bx', np.float64), ('by', np.float64),
+                        ('a0x', np.float64), ('a0y', np.float64), ('b0x', np.float64), ('b0y', np.float64),
+                        ('L1', np.float64), ('L2', np.float64), ('L3', np.float64), ('L4', np.float64),
+                        ('theta2start', np.float64), ('theta2end', np.float64),
+                        ('assembles', np.bool_), ('ratio', np.float64), ('transmission', np.float64),
+                        ('clearance', np.float64), ('score', np.float64)])
+
+# how much each measure counts in the score
+DEFAULT_WEIGHTS = {'transmission': 1.0, 'ratio': 1.0, 'clearance': 1.0}
+
+
+def gridCandidates(aBox, bBox, steps=10):
+    # every combination of an a on a steps x steps grid and a b on a steps x steps grid
+    # aBox and bBox are (xmin, xmax, ymin, ymax), returns an (steps**4, 4) array of ax, ay, bx, by
+    axes = [np.linspace(aBox[0], aBox[1], steps), np.linspace(aBox[2], aBox[3], steps),
+            np.linspace(bBox[0], bBox[1], steps), np.linspace(bBox[2], bBox[3], steps)]
+    return np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, 4)
+
+
+def randomCandidates(aBox, bBox, count=10000, seed=None):
+    # uniformly random a and b inside the two boxes, returns a (count, 4) array of ax, ay, bx, by
+    rng = np.random.default_rng(seed)
+    low = [aBox[0], aBox[2], bBox[0], bBox[2]]
+    high = [aBox[1], aBox[3], bBox[1], bBox[3]]
+    return rng.uniform(low, high, size=(count, 4))
+
+
+def sweepProblem(anim, steps=90, clearanceSteps=24, weights=None, clearanceScale=None, payloads=True):
+    # everything the workers need from a FourbarAnimator (after ProcessFile), as plain data
+    # steps - crank angles checked for assembly and transmission angle
+    # clearanceSteps - crank angles checked for boundary clearance  (this is the slow part)
+    # clearanceScale - a clearance this big (or bigger) gets the full clearance score
+    #                  5% of the window size if None
+    if clearanceScale is None:
+        clearanceScale = 0.05*max(anim.xmax - anim.xmin, anim.ymax - anim.ymin)
+    moving = segments([g.shape for g in anim.payloads]) if payloads else np.zeros((0, 2, 2))
+    return {'p1': tuple(anim.p1), 'p2': tuple(anim.p2), 'p3': tuple(anim.p3),
+            'reverseAngle': bool(anim.reverseAngle), 'steps': int(steps), 'clearanceSteps': int(clearanceSteps),
+            'weights': dict(DEFAULT_WEIGHTS, **(weights or {})), 'clearanceScale': float(clearanceScale),
+            'payloadSegments': moving, 'boundarySegments': segments([g.shape for g in anim.boundaries])}
+
+
+def segments(shapes):
+    # all of the line segments of a list of (n, 2) point lists, as an (nsegments, 2, 2) array
+    pieces = [np.stack([shape[:-1], shape[1:]], axis=1) for shape in map(np.asarray, shapes) if len(shape) > 1]
+    if len(pieces) == 0: return np.zeros((0, 2, 2))
+    return np.concatenate(pieces).astype(float)
+
+
+def synthesize(candidates, problem):
+    # the fixed pivots and crank range for every candidate, the same way DesignFourbar() does it
+    p1, p2, p3 = problem['p1'], problem['p2'], problem['p3']
+    c = np.asarray(candidates, dtype=float)
+    result = np.zeros(len(c), dtype=SWEEP_DTYPE)
+    for name, column in zip(('ax', 'ay', 'bx', 'by'), c.T): result[name] = column
+
+    a, b = c[:, 0:2], c[:, 2:4]
+    amid = transform(a, p2[0], p2[1], p2[2]*np.pi/180, p1[0], p1[1])
+    afinal = transform(a, p3[0], p3[1], p3[2]*np.pi/180, p1[0], p1[1])
+    bmid = transform(b, p2[0], p2[1], p2[2]*np.pi/180, p1[0], p1[1])
+    bfinal = transform(b, p3[0], p3[1], p3[2]*np.pi/180, p1[0], p1[1])
+    a0, aok = circumcenter(a, amid, afinal)
+    b0, bok = circumcenter(b, bmid, bfinal)
+    result['a0x'], result['a0y'] = a0[:, 0], a0[:, 1]
+    result['b0x'], result['b0y'] = b0[:, 0], b0[:, 1]
+
+    start = np.arctan2(a[:, 1] - a0[:, 1], a[:, 0] - a0[:, 0])
+    mid = np.arctan2(amid[:, 1] - a0[:, 1], amid[:, 0] - a0[:, 0])
+    end = np.arctan2(afinal[:, 1] - a0[:, 1], afinal[:, 0] - a0[:, 0])
+    mismatch = np.sign(mid - start) != np.sign(end - start)
+    end = np.where(mismatch, np.where(end < 0, end + 2*np.pi, end - 2*np.pi), end)
+    if problem['reverseAngle']: end = end - 2*np.pi
+    result['theta2start'], result['theta2end'] = start, end
+
+    result['L1'] = np.hypot(*(a0 - b0).T)
+    result['L2'] = np.hypot(*(a - a0).T)
+    result['L3'] = np.hypot(*(b - a).T)
+    result['L4'] = np.hypot(*(b - b0).T)
+    return result, aok & bok, (mid, bmid, bfinal)
+
+
+def solvePins(result, th2):
+    # pins a and b for every candidate (rows) and crank angle (columns), on the starting assembly branch
+    # like Fourbar.SolveAllPositions(), but for many linkages at once
+    a0x, a0y = result['a0x'][:, None], result['a0y'][:, None]
+    b0x, b0y = result['b0x'][:, None], result['b0y'][:, None]
+    L2, L3, L4 = result['L2'][:, None], result['L3'][:, None], result['L4'][:, None]
+    ax, ay = a0x + L2*np.cos(th2), a0y + L2*np.sin(th2)
+
+    # branch: which side of the line from a to b0 pin b starts on  (Fourbar.AssemblyBranch)
+    side = np.where(((b0x - result['ax'][:, None])*(result['by'][:, None] - result['ay'][:, None])
+                     - (b0y - result['ay'][:, None])*(result['bx'][:, None] - result['ax'][:, None])) < 0, -1.0, 1.0)
+
+    dx, dy = b0x - ax, b0y - ay
+    d = np.hypot(dx, dy)
+    tol = 1e-9*(L3 + L4)
+    closes = (d > 0) & (d <= L3 + L4 + tol) & (d >= np.abs(L3 - L4) - tol)
+    dsafe = np.where(d > 0, d, 1.0)
+    ux, uy = dx/dsafe, dy/dsafe
+    along = (d**2 + L3**2 - L4**2)/(2*dsafe)
+    h = np.sqrt(np.clip(L3**2 - along**2, 0, None))
+    bx = ax + along*ux - side*h*uy
+    by = ay + along*uy + side*h*ux
+    return ax, ay, bx, by, closes
+
+
+def segmentDistance(px0, py0, px1, py1, qx0, qy0, qx1, qy1):
+    # shortest distance between segments p0-p1 and q0-q1, for arrays (or numbers) of x and y values
+    # the x and y parts are kept apart because that is much faster than (..., 2) arrays
+    def pointToSegment2(x, y, x0, y0, dx, dy, length2):
+        # squared distance from point x,y to the segment starting at x0,y0
+        t = np.clip(((x - x0)*dx + (y - y0)*dy)/length2, 0, 1)
+        ex, ey = x0 + t*dx - x, y0 + t*dy - y
+        return ex*ex + ey*ey
+
+    rx, ry = px1 - px0, py1 - py0
+    sx, sy = qx1 - qx0, qy1 - qy0
+    r2 = np.maximum(rx*rx + ry*ry, 1e-300)
+    s2 = np.maximum(sx*sx + sy*sy, 1e-300)
+    distance2 = np.minimum(np.minimum(pointToSegment2(px0, py0, qx0, qy0, sx, sy, s2),
+                                      pointToSegment2(px1, py1, qx0, qy0, sx, sy, s2)),
+                           np.minimum(pointToSegment2(qx0, qy0, px0, py0, rx, ry, r2),
+                                      pointToSegment2(qx1, qy1, px0, py0, rx, ry, r2)))
+
+    # the segments cross if each one has the ends of the other on opposite sides
+    crossing = ((rx*(qy0 - py0) - ry*(qx0 - px0))*(rx*(qy1 - py0) - ry*(qx1 - px0)) < 0) & \
+               ((sx*(py0 - qy0) - sy*(px0 - qx0))*(sx*(py1 - qy0) - sy*(px1 - qx0)) < 0)
+    return np.where(crossing, 0.0, np.sqrt(distance2))
+
+
+def scoreCandidates(candidates, problem):
+    # synthesize and score a chunk of candidates, returns an unsorted SWEEP_DTYPE array
+    result, ok, (mid, bmid, bfinal) = synthesize(candidates, problem)
+    start, end = result['theta2start'][:, None], result['theta2end'][:, None]
+    th2 = start + (end - start)*np.linspace(0, 1, problem['steps'])[None, :]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ax, ay, bx, by, closes = solvePins(result, th2)
+
+        # the mid and final design positions must be reached on the same branch
+        check = np.stack([mid, result['theta2end']], axis=1)
+        _, _, cbx, cby, cclose = solvePins(result, check)
+        scale = np.maximum(result['L3'], result['L4'])[:, None]
+        target = np.stack([bmid, bfinal], axis=1)
+        reached = cclose & (np.hypot(cbx - target[..., 0], cby - target[..., 1]) <= 1e-6*scale)
+        assembles = ok & np.all(closes, axis=1) & np.all(reached, axis=1)
+
+        # link length ratio
+        lengths = np.stack([result['L1'], result['L2'], result['L3'], result['L4']], axis=1)
+        result['ratio'] = lengths.max(axis=1)/lengths.min(axis=1)
+
+        # transmission angle at pin b, between the coupler (b to a) and the rocker (b to b0)
+        ux, uy = ax - bx, ay - by
+        vx, vy = result['b0x'][:, None] - bx, result['b0y'][:, None] - by
+        cosmu = (ux*vx + uy*vy)/(result['L3'][:, None]*result['L4'][:, None])
+        mu = np.degrees(np.arccos(np.clip(np.abs(cosmu), 0, 1)))  # 0 to 90, folded
+        result['transmission'] = np.min(mu, axis=1)
+
+        # clearance is the slow part, so only for the linkages that work
+        result['clearance'] = np.nan
+        rows = np.nonzero(assembles)[0]
+        result['clearance'][rows] = clearance(result[rows], problem)
+
+    w = problem['weights']
+    score = (w['transmission']*result['transmission']/90 + w['ratio']/result['ratio']
+             + w['clearance']*np.minimum(result['clearance']/problem['clearanceScale'], 1.0))
+    result['assembles'] = assembles
+    result['score'] = np.where(assembles & np.isfinite(score), score, -np.inf)
+    return result
+
+
+def clearance(result, problem):
+    # smallest distance from any moving link or payload segment to any boundary segment
+    # over problem['clearanceSteps'] crank angles
+    walls = problem['boundarySegments']
+    n = len(result)
+    if len(walls) == 0 or n == 0: return np.full(n, np.inf)
+    start, end = result['theta2start'][:, None], result['theta2end'][:, None]
+    ax, ay, bx, by, _ = solvePins(result, start + (end - start)*np.linspace(0, 1, problem['clearanceSteps'])[None, :])
+
+    # the three moving links: crank a0-a, coupler a-b, rocker b-b0   (n, steps, 3) x and y values
+    a0x, a0y = np.broadcast_to(result['a0x'][:, None], ax.shape), np.broadcast_to(result['a0y'][:, None], ax.shape)
+    b0x, b0y = np.broadcast_to(result['b0x'][:, None], bx.shape), np.broadcast_to(result['b0y'][:, None], bx.shape)
+    px0, py0 = np.stack([a0x, ax, bx], axis=2), np.stack([a0y, ay, by], axis=2)
+    px1, py1 = np.stack([ax, bx, b0x], axis=2), np.stack([ay, by, b0y], axis=2)
+
+    # payloads ride on the coupler: rotate about the starting a and move to the current a
+    payload = problem['payloadSegments']
+    if len(payload):
+        angle = np.arctan2(by - ay, bx - ax) - np.arctan2(result['by'] - result['ay'],
+                                                          result['bx'] - result['ax'])[:, None]
+        c, s = np.cos(angle)[..., None], np.sin(angle)[..., None]
+        x0, y0 = result['ax'][:, None, None], result['ay'][:, None, None]
+        moved = []
+        for end in (0, 1):
+            x, y = payload[None, None, :, end, 0] - x0, payload[None, None, :, end, 1] - y0
+            moved.append((c*x - s*y + ax[..., None], s*x + c*y + ay[..., None]))
+        px0, py0 = np.concatenate([px0, moved[0][0]], axis=2), np.concatenate([py0, moved[0][1]], axis=2)
+        px1, py1 = np.concatenate([px1, moved[1][0]], axis=2), np.concatenate([py1, moved[1][1]], axis=2)
+
+    # a box around everything that moves, for every candidate
+    xmin = np.minimum(px0, px1).reshape(n, -1).min(axis=1)
+    xmax = np.maximum(px0, px1).reshape(n, -1).max(axis=1)
+    ymin = np.minimum(py0, py1).reshape(n, -1).min(axis=1)
+    ymax = np.maximum(py0, py1).reshape(n, -1).max(axis=1)
+
+    best = np.full(n, np.inf)
+    for (qx0, qy0), (qx1, qy1) in walls:  # one boundary segment at a time keeps the arrays small
+        # skip the candidates whose box is already farther from this segment than their best so far
+        gapx = np.maximum(np.maximum(min(qx0, qx1) - xmax, xmin - max(qx0, qx1)), 0)
+        gapy = np.maximum(np.maximum(min(qy0, qy1) - ymax, ymin - max(qy0, qy1)), 0)
+        rows = np.nonzero(np.hypot(gapx, gapy) < best)[0]
+        if len(rows) == 0: continue
+        distance = segmentDistance(px0[rows], py0[rows], px1[rows], py1[rows], qx0, qy0, qx1, qy1)
+        best[rows] = np.minimum(best[rows], np.nanmin(distance.reshape(len(rows), -1), axis=1))
+    return best
+
+
+# the problem, set once in every worker process
+workerProblem = None
+
+
+def initWorker(problem):
+    global workerProblem
+    workerProblem = problem
+
+
+def scoreChunk(candidates):
+    return scoreCandidates(candidates, workerProblem)
+
+
+def sweepDesigns(problem, candidates, workers=None, chunksize=256, keepFailed=False, progress=None):
+    # problem - from sweepProblem()
+    # candidates - an (n, 4) array of ax, ay, bx, by  (see gridCandidates and randomCandidates)
+    # workers - number of processes, one per CPU core if None (1 scores everything in this process)
+    # keepFailed - also return the candidates that don't assemble (at the end of the table)
+    # progress - optional function called as progress(candidates done, total candidates)
+    # returns a SWEEP_DTYPE table, best score first
+    candidates = np.asarray(candidates, dtype=float).reshape(-1, 4)
+    chunks = [candidates[i:i + chunksize] for i in range(0, len(candidates), chunksize)]
+    if workers is None: workers = os.cpu_count() or 1
+
+    results = []
+    done = 0
+    if workers <= 1 or len(chunks) <= 1:
+        scored = (scoreCandidates(chunk, problem) for chunk in chunks)
+        pool = None
+    else:
+        pool = multiprocessing.get_context("spawn").Pool(workers, initializer=initWorker, initargs=(problem,))
+        scored = pool.imap(scoreChunk, chunks)
+    try:
+        for result in scored:
+            results.append(result if keepFailed else result[result['assembles']])
+            done += chunksize
+            if progress is not None: progress(min(done, len(candidates)), len(candidates))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    table = np.concatenate(results) if results else np.zeros(0, dtype=SWEEP_DTYPE)
+    return table[np.argsort(-table['score'], kind='stable')]
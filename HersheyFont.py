@@ -1,4 +1,5 @@
 import numpy as np
+from collections import OrderedDict
 from OpenGL.GL import *
 
 
@@ -8,56 +9,99 @@ class HersheyFont:
 
     def drawText(self,text, xloc, yloc, scale=1, angle=0, slant=0, weight = 3, center = False, justify = -1):
 
-        cosval = np.cos(angle*np.pi/180)
-        sinval = np.sin(angle*np.pi/180)
-        rotate = [[cosval, sinval], [-sinval, cosval]]
+        textlines = self.textVertices(text, xloc, yloc, scale, angle, slant, center, justify)
+        self.drawLines(textlines, weight)
+
+
+    def drawTextBatch(self, items, slant=0, weight = 3, center = False, justify = -1):
+        # draw many strings with ONE draw call
+        # items is a list of (text, (xloc, yloc), scale, angle) tuples, scale and angle may be left off
+        pieces = []
+        for item in items:
+            text, (xloc, yloc) = item[0], item[1]
+            scale = item[2] if len(item) > 2 else 1
+            angle = item[3] if len(item) > 3 else 0
+            pieces.append(self.textVertices(text, xloc, yloc, scale, angle, slant, center, justify))
+        if len(pieces) == 0: return
+        self.drawLines(np.concatenate(pieces), weight)
 
-        textlines = self.string_strokes(text)
-        textlines = (textlines  * scale/32)
-        length = np.amax(textlines[:,0]) - np.amin(textlines[:,0])
-        xmid =  ( np.amax(textlines[:,0]) + np.amin(textlines[:,0]) ) /2
-        ymid =  ( np.amax(textlines[:,1]) + np.amin(textlines[:,1]) ) /2
 
+    def textVertices(self, text, xloc, yloc, scale=1, angle=0, slant=0, center = False, justify = -1):
+        # the line end points of a string, placed in the drawing (pairs of points, as in GL_LINES)
 
+        lines, xmin, xmax, ymin, ymax = self.layout(text)
+        if len(lines) == 0: return lines  # nothing to draw (blanks)
 
+        # scale, center/justify, slant and rotate all in one 2x2 matrix and one offset
+        size = scale/32
+        length = (xmax - xmin) * size
+        xmid = (xmax + xmin) / 2 * size
+        ymid = (ymax + ymin) / 2 * size
+        shift = np.zeros(2)
         if center :
-            textlines -= [xmid, ymid]
+            shift += [xmid, ymid]
 
         if justify == -1:
             pass
         elif  justify == 0:
-            textlines -= [xmid, 0]
+            shift += [xmid, 0]
         elif justify == 1:
-            textlines -= [length, 0]
+            shift += [length, 0]
 
+        cosval = np.cos(angle*np.pi/180)
+        sinval = np.sin(angle*np.pi/180)
+        rotate = np.array([[cosval, sinval], [-sinval, cosval]])
+        slanted = np.array([[1, 0], [slant, 1]]) @ rotate
+        matrix = (size * slanted).astype(np.float32)
+        offset = ([xloc, yloc] - shift @ slanted).astype(np.float32)
 
-        if slant != 0:
-            textlines[:,0] += textlines[:,1]*slant
-        textlines = np.dot(textlines,rotate)
-        textlines += [xloc, yloc]
+        return lines @ matrix + offset
 
+
+    def drawLines(self, textlines, weight = 3):
+        # submit all of the line segments in one glDrawArrays() call
+        if len(textlines) == 0: return
+        vertices = np.ascontiguousarray(textlines, dtype=np.float32)
         glLineWidth(weight)
-        glBegin(GL_LINES)
-        for i in range(0, len(textlines), 2):
-            x0, y0 = textlines[i]
-            x1, y1 = textlines[i + 1]
-            glVertex2f(x0, y0)
-            glVertex2f(x1, y1)
-        glEnd()
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(2, GL_FLOAT, 0, vertices)
+        glDrawArrays(GL_LINES, 0, len(vertices))
+        glDisableClientState(GL_VERTEX_ARRAY)
 
 
-    def string_strokes(self,text, scale=1, angle=0):
-        lines = None
+    def layout(self, text):
+        # strokes and extents of a whole string, from the LRU cache when possible
+        # returns (lines, xmin, xmax, ymin, ymax)   the lines array must not be changed
+        cache = self.layoutCache
+        if text in cache:
+            cache.move_to_end(text)
+            return cache[text]
+
+        pieces = []
         xstart = 0
         for ch in text:
-            newlines, size = self.char_strokes(ch)
-            if len(newlines) > 0:
-                newlines = np.array(newlines, dtype = np.float32) + [xstart, 0]
-                if lines is None:
-                    lines = newlines
-                else:
-                    lines = np.vstack((lines, newlines))
+            glyph, size = self.glyphs.get(ch, (None, 0))
+            if glyph is not None and len(glyph) > 0:
+                pieces.append(glyph + np.float32([xstart, 0]))
             xstart += size
+
+        if len(pieces) > 0:
+            lines = np.concatenate(pieces)
+            entry = (lines, lines[:, 0].min(), lines[:, 0].max(), lines[:, 1].min(), lines[:, 1].max())
+        else:
+            lines = np.zeros((0, 2), dtype=np.float32)
+            entry = (lines, 0, 0, 0, 0)
+        lines.setflags(write=False)
+
+        cache[text] = entry
+        if len(cache) > self.layoutCacheSize:
+            cache.popitem(last=False)  # forget the least recently used string
+        return entry
+
+
+    def string_strokes(self,text, scale=1, angle=0):
+        lines = self.layout(text)[0]
+        if len(lines) == 0: return None
         return lines
 
 
@@ -159,6 +203,17 @@ class HersheyFont:
             65, 71, 65, 73, 67, 73, 74, 74, 75, 76, 75, 33, 74, 75, 73, 76, 73, 84, 71, 86, 67, 86, 254, 89, 33, 86, 79, 86, 77, 85, 75, 83, 74, 80, 74, 78, 75, 76, 79, 74, 80, 71, 80, 69, 79, 68, 77,
             68, 75, 254, 94, 254, 54, 139, 71, 246, 80, 139, 94, 254]
 
+        # stroke cache:  every character as a contiguous float32 array of line end points, built once
+        self.glyphs = {}
+        for i in range(len(self.grloc)):
+            ch = chr(i + 32)
+            lines, size = self.char_strokes(ch)
+            self.glyphs[ch] = (np.array(lines, dtype=np.float32).reshape(-1, 2), size)
+
+        # laid out strings, most recently used last
+        self.layoutCache = OrderedDict()
+        self.layoutCacheSize = 512
+
 def main():
     hf=HersheyFont()
     ss = hf.string_strokes("Hello World!")
@@ -0,0 +1,72 @@
+'''
+Keyword data file parser shared by all of the animators
+    Data files are lines of  keyword, value, value, ...   Keywords ignore capitalization,
+    parentheses are ignored, and lines starting with # (or with an unknown keyword) are skipped.
+
+    Each keyword is looked up ONCE in a dispatch table instead of being compared against
+    every keyword, and the file is read one line at a time instead of all at once.
+    Numeric lines (point lists, angles, temperature rows) are converted in one np.fromstring() call.
+
+    parser = KeywordParser()
+    parser.addText('title', handler)              handler(cells)   cells[0] is the keyword
+    parser.addNumbers('window', handler)          handler(labels, values)   values is a float array
+    parser.addNumbers('payload', handler, 2)      the first 2 cells are text labels, the rest are numbers
+    parser.addRaw('row', handler)                 handler(text)    everything after the keyword, untouched
+    parser.parse(filename)
+'''
+
+import numpy as np
+
+
+class KeywordParser():
+
+    def __init__(self):
+        self.handlers = {}  # keyword -> (kind, handler, number of text labels)
+
+    def addText(self, keyword, handler):
+        self.handlers[keyword.lower()] = ('text', handler, 0)
+
+    def addNumbers(self, keyword, handler, labels=0):
+        self.handlers[keyword.lower()] = ('numbers', handler, labels)
+
+    def addRaw(self, keyword, handler):
+        self.handlers[keyword.lower()] = ('raw', handler, 0)
+
+    def parse(self, filename):
+        with open(filename, 'r') as f1:  # read one line at a time
+            for number, line in enumerate(f1, 1):
+                try:
+                    self.parseLine(line)
+                except ValueError as error:  # bad numbers, or a handler that didn't like the line
+                    raise ValueError('{}, line {}: {}'.format(filename, number, error)) from error
+
+    def parseLine(self, line):
+        line = line.strip()
+        if len(line) == 0 or line[0] == '#': return  # blank or comment
+
+        keyword, _, rest = line.partition(',')
+        entry = self.handlers.get(keyword.replace('(', '').replace(')', '').strip().lower())
+        if entry is None: return  # not one of ours
+
+        kind, handler, labels = entry
+        if kind == 'raw':
+            handler(rest)
+            return
+
+        rest = rest.replace('(', '').replace(')', '')
+        if kind == 'text':
+            handler([keyword] + rest.split(','))
+            return
+
+        # numbers, after any text labels
+        cells = rest.split(',', labels)
+        numbers = cells[labels] if len(cells) > labels else ''
+        try:
+            values = np.fromstring(numbers, dtype=np.float64, sep=',')
+        except (ValueError, DeprecationWarning):
+            values = None
+        # older NumPy stops at a bad or empty cell (with a warning) instead of raising,
+        # so anything short of one value per cell is converted cell by cell
+        if values is None or len(values) != numbers.count(',') + 1:
+            values = np.array([float(cell) for cell in numbers.split(',') if cell.strip()])  # skips empty cells
+        handler([cell.strip() for cell in cells[:labels]], values)
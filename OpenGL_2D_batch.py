@@ -0,0 +1,161 @@
+'''
+Retained mode drawing for the gl2D class
+    Lines, line strips, polygons and circles are appended to NumPy vertex arrays
+    and uploaded to the GPU as a single vertex buffer object (VBO).
+    Everything with the same primitive type and line width is drawn with ONE glDrawArrays() call,
+    so the number of OpenGL calls no longer depends on the number of vertices.
+    Colors are stored per vertex, so shapes of different colors still share a draw call.
+
+    Typical use inside a drawCallback():
+        batch.clear()
+        batch.addLineStrip(points, color=(1,0,0), width=2)
+        batch.addCircles(xarray, yarray, radius, colors, fill=True)
+        batch.draw()
+    If nothing changes between frames, skip clear() and the add...() calls and just call draw()
+    With gl2D(..., renderer="shader") the same buffer is drawn by the gl2DShader program instead
+    of the fixed function vertex arrays (see OpenGL_2D_shader.py)
+'''
+
+import ctypes
+import numpy as np
+
+from OpenGL.GL import *
+
+from OpenGL_2D_shader import gl2DShader
+
+
+class gl2DBatch():
+
+    def __init__(self, usage=GL_DYNAMIC_DRAW):
+        self.usage = usage  # GL_STATIC_DRAW for data that never changes
+        self.parts = {}  # (GL primitive, line width) -> list of (n,5) float32 arrays of x,y,r,g,b
+        self.styles = []  # (GL primitive, line width, first vertex, vertex count) after packing
+        self.vertices = np.zeros((0, 5), dtype=np.float32)
+        self.vbo = None
+        self.dirty = False  # do we need to upload again?
+
+    def clear(self):
+        self.parts = {}
+        self.dirty = True
+
+    def colorArray(self, color, n):
+        # one rgb value for everything or one rgb value per vertex
+        colors = np.asarray(color, dtype=np.float32).reshape(-1, 3)
+        return np.broadcast_to(colors, (n, 3))
+
+    def add(self, mode, points, colors, width=1.0):
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        if len(points) == 0: return
+        colors = self.colorArray(colors, len(points))
+        self.parts.setdefault((mode, float(width)), []).append(np.hstack((points, colors)))
+        self.dirty = True
+
+    def addLines(self, points, color=(0, 0, 0), width=1.0):
+        # pairs of points, just like GL_LINES
+        self.add(GL_LINES, points, color, width)
+
+    def addLineStrip(self, points, color=(0, 0, 0), width=1.0):
+        # connected points, just like GL_LINE_STRIP
+        # stored as separate segments so that many strips can share one draw call
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        if len(points) < 2: return
+        colors = self.colorArray(color, len(points))
+        self.add(GL_LINES, np.repeat(points, 2, axis=0)[1:-1], np.repeat(colors, 2, axis=0)[1:-1], width)
+
+    def addPolygon(self, points, color=(0, 0, 0), fill=True, width=1.0):
+        # a convex polygon, just like GL_POLYGON when filled
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        if fill is False:
+            self.addLineStrip(np.vstack((points, points[:1])), color, width)
+            return
+        if len(points) < 3: return
+        colors = self.colorArray(color, len(points))
+        i = np.arange(1, len(points) - 1)
+        fan = np.stack((np.zeros_like(i), i, i + 1), axis=1).ravel()  # triangle fan from the first point
+        self.add(GL_TRIANGLES, points[fan], colors[fan])
+
+    def addCircles(self, xcenter, ycenter, radius, color=(0, 0, 0), fill=False, faces=24, width=1.0):
+        # any number of circles in one call
+        # xcenter, ycenter and radius may be single values or arrays
+        # color may be one rgb value or one rgb value per circle
+        xc, yc, r = np.broadcast_arrays(np.atleast_1d(np.asarray(xcenter, dtype=np.float32)),
+                                        np.atleast_1d(np.asarray(ycenter, dtype=np.float32)),
+                                        np.atleast_1d(np.asarray(radius, dtype=np.float32)))
+        ncircles = len(xc)
+        if ncircles == 0: return
+
+        theta = np.linspace(0, 2 * np.pi, faces + 1)
+        ring = np.empty((ncircles, faces + 1, 2), dtype=np.float32)
+        ring[:, :, 0] = xc[:, None] + r[:, None] * np.cos(theta)
+        ring[:, :, 1] = yc[:, None] + r[:, None] * np.sin(theta)
+        colors = self.colorArray(color, ncircles)
+
+        if fill:
+            # one triangle per face:  center, ring[i], ring[i+1]
+            tris = np.empty((ncircles, faces, 3, 2), dtype=np.float32)
+            tris[:, :, 0, 0] = xc[:, None]
+            tris[:, :, 0, 1] = yc[:, None]
+            tris[:, :, 1] = ring[:, :-1]
+            tris[:, :, 2] = ring[:, 1:]
+            self.add(GL_TRIANGLES, tris, np.repeat(colors, faces * 3, axis=0))
+        else:
+            segs = np.empty((ncircles, faces, 2, 2), dtype=np.float32)
+            segs[:, :, 0] = ring[:, :-1]
+            segs[:, :, 1] = ring[:, 1:]
+            self.add(GL_LINES, segs, np.repeat(colors, faces * 2, axis=0), width)
+
+    def upload(self):
+        # pack everything into one array and send it to the GPU
+        self.styles = []
+        arrays = []
+        first = 0
+        for (mode, width), parts in self.parts.items():
+            count = sum(len(p) for p in parts)
+            self.styles.append((mode, width, first, count))
+            arrays.extend(parts)
+            first += count
+
+        if len(arrays) > 0:
+            self.vertices = np.ascontiguousarray(np.vstack(arrays), dtype=np.float32)
+        else:
+            self.vertices = np.zeros((0, 5), dtype=np.float32)
+        self.dirty = False
+        if len(self.vertices) == 0: return
+
+        if self.vbo is None:
+            self.vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices, self.usage)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def draw(self):
+        if self.dirty: self.upload()
+        if len(self.vertices) == 0: return
+
+        stride = self.vertices.strides[0]
+        if gl2DShader.current is not None:
+            gl2DShader.current.drawBuffer(self.vbo, self.styles, stride)
+            return
+
+        glPushAttrib(GL_CURRENT_BIT | GL_LINE_BIT)  # the color array changes the current color
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        glVertexPointer(2, GL_FLOAT, stride, ctypes.c_void_p(0))
+        glColorPointer(3, GL_FLOAT, stride, ctypes.c_void_p(8))
+
+        for mode, width, first, count in self.styles:
+            glLineWidth(width)
+            glDrawArrays(mode, first, count)
+
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glPopAttrib()
+
+    def delete(self):
+        # free the GPU buffer  (needs the GL context to be current)
+        if self.vbo is not None:
+            glDeleteBuffers(1, [self.vbo])
+            self.vbo = None
+        self.dirty = True
@@ -4,6 +4,13 @@ Modified 7/3/2025   Added support for GLFW pop up window
     The program is paused until the user closes the window
     To use a GLFW window, create the gl2D object with QTwindow = None
 PyQT is still supported but is no longer the ONLY windowing system
+Added windowType = "offscreen" for drawing without any window (batch servers, CI)
+    set PYOPENGL_PLATFORM to "osmesa" or "egl" before importing, then use glRenderFrame()
+Added renderer = "shader" to draw batches (and instanced circles, arrows, joints) with a GLSL program
+    add coreProfile=True (GLFW or EGL offscreen) for a core profile context with no fixed function pipeline,
+    then the drawCallback() must draw with gl2DBatch and glGetShader() only
+Added frame timing:  glEnableTiming() records the callback, draw, swap and poll time of every frame
+    (see OpenGL_2D_timing.py)
 '''
 
 
@@ -14,6 +21,14 @@ from OpenGL.GL import *
 from OpenGL.GLU import *
 from OpenGL.GLUT import *
 
+from OpenGL_2D_batch import gl2DBatch
+from OpenGL_2D_layer import gl2DLayer
+from OpenGL_2D_pointindex import gl2DPointIndex
+from OpenGL_2D_view import gl2DViewMatrices, applyMatrix, glMatrix4
+from OpenGL_2D_offscreen import offscreenContext
+from OpenGL_2D_shader import gl2DShader, fixedShapes, arcTable, unitCircle, unitArrow
+from OpenGL_2D_timing import gl2DFrameTimer
+
 from glfw import (init as glfw_init,
                   create_window as glfw_create_widow,
                   make_context_current as glfw_make_context_current,
@@ -22,12 +37,18 @@ from glfw import (init as glfw_init,
                   window_should_close as glfw_window_should_close,
                   poll_events as glfw_poll_events,
                   terminate as glfw_terminate,
-                  set_window_size_callback as glfw_set_window_size_callback)
+                  window_hint as glfw_window_hint,
+                  set_window_size_callback as glfw_set_window_size_callback,
+                  wait_events as glfw_wait_events,
+                  wait_events_timeout as glfw_wait_events_timeout,
+                  CONTEXT_VERSION_MAJOR, CONTEXT_VERSION_MINOR, OPENGL_PROFILE, OPENGL_CORE_PROFILE,
+                  OPENGL_FORWARD_COMPAT)
 
-from PyQt5.QtCore import Qt, QEvent
+from PyQt5.QtCore import Qt, QEvent, QTimer
 
-from time import sleep
+from time import sleep, monotonic, perf_counter
 import threading
+import warnings
 import sys
 
 class gl2D():
@@ -36,9 +57,17 @@ class gl2D():
                  allowDistortion=False,
                  xmin=0, xmax=1, ymin=0, ymax=1,
                  rotate=0, zoom=1.0,
-                 backgroundcolor=(0.65, 0.65, 0.65), width = 1200, height = 600, title = "OpenGL"):
-        if QTWindow == None:
+                 backgroundcolor=(0.65, 0.65, 0.65), width = 1200, height = 600, title = "OpenGL",
+                 renderer="fixed", coreProfile=False):
+        if windowType == "offscreen":
+            self.glWindow = offscreenContext(width, height, coreProfile)
+        elif QTWindow == None:
             glfw_init()
+            if coreProfile:
+                glfw_window_hint(CONTEXT_VERSION_MAJOR, 3)
+                glfw_window_hint(CONTEXT_VERSION_MINOR, 3)
+                glfw_window_hint(OPENGL_PROFILE, OPENGL_CORE_PROFILE)
+                if sys.platform == "darwin": glfw_window_hint(OPENGL_FORWARD_COMPAT, True)
             glfwWindow = glfw_create_widow(width, height, title, None, None)
             windowType = "glfw"
             self.glWindow = glfwWindow
@@ -69,6 +98,10 @@ class gl2D():
         self.glModel = None  # storing the model matrix
         self.glProjection = None  # storing the projection matrix
         self.glView = None  # storing the Viewport array
+        self.glNDCMatrix = None  # world -> OpenGL device coordinates  (3x3, see OpenGL_2D_view.py)
+        self.glScreenMatrix = None  # world -> window pixels
+        self.glScreenInverse = None  # window pixels -> world
+        self.glViewport = None
 
         # Animation control Data
         self.glAnimationIsRunning = False #are we already running animation?
@@ -81,12 +114,19 @@ class gl2D():
         self.glAnimationReverse = False  #reverse when the end is reached?
         self.glAnimationReversed = False  #are we currently moving in reverse?
         self.glAnimationReset = True #reset the animation at the end
+        self.glAnimationFrameTime = 0  #target time between frame starts (in seconds)
+        self.glAnimationFramesShown = 0  #frames actually drawn since the start
+        self.glAnimationDroppedFrames = 0  #frames skipped to stay on schedule
+        self.glAnimationStartTime = 0  #monotonic clock time of tick 0
+        self.glAnimationTickCount = 0  #number of frame times since glAnimationStartTime
+        self.glAnimationTimer = None  #QTimer that drives the animation in a PyQt window
         self.glRestartDraggingCallback = None
 
 
         #Mouse Interaction Data
         self.glMouseTextBox = None
         self.glDragList = None
+        self.glDragIndex = None  # gl2DPointIndex of the drag list, for fast mouse lookups
         self.glDragListIndex = -1
         self.glDragMaxDist = None
         self.glDragCallback = None
@@ -95,6 +135,19 @@ class gl2D():
         self.glDraggingHandleWidth = 2
         self.glDraggingHandleColor = [1,1,1]
 
+        # Retained mode drawing data
+        self.glBatches = {}  # named gl2DBatch objects (vertex buffers)
+        self.glLayers = {}  # named gl2DLayer objects (recorded static drawing)
+
+        # Shader drawing data
+        self.glRenderer = renderer  # "fixed" or "shader"  (see OpenGL_2D_shader.py)
+        self.glCoreProfile = coreProfile  # no fixed function matrices to load
+        self.glShader = None  # gl2DShader, created on first use
+
+        # Frame timing data
+        self.glFrameTimer = gl2DFrameTimer()  # records nothing until glEnableTiming()
+        self.glTimingOverlay = False  # show the timing numbers in the window
+
         if self.glWindowType == "PyQt":
             self.glWindow.initializeGL = self.glInit  # initialize callback
             self.glWindow.paintGL = self.paintGL  # paint callback
@@ -102,27 +155,52 @@ class gl2D():
             glfw_make_context_current(self.glWindow)
             glfw_set_window_size_callback(self.glWindow, self.glfwSizeChange)
             self.glInit()
+        # an offscreen context is already current and has no GLUT to initialize
 
 
     def glInit(self):
         glutInit(sys.argv)
 
     def glUpdate(self):
+        timer = self.glFrameTimer
+        ownFrame = not timer.inFrame  # a redraw that isn't part of an animation frame
+        if ownFrame: timer.beginFrame()
+
         if self.glWindowType == "PyQt":
             self.glWindow.update()
         if self.glWindowType == "glfw":
             self.paintGL()
+            start = perf_counter()
             glfw_swap_buffers(self.glWindow)
+            timer.add("swap", perf_counter() - start)
+            start = perf_counter()
             glfw_poll_events()
+            timer.add("poll", perf_counter() - start)
             if glfw_window_should_close(self.glWindow):
                 if self.glAnimationIsRunning:
                     self.glStopAnimation()
+        if self.glWindowType == "offscreen":
+            self.paintGL()
+            start = perf_counter()
+            glFinish()
+            timer.add("swap", perf_counter() - start)
+
+        if ownFrame: timer.endFrame()
 
 
     def glWait(self):
+        # the GLFW event loop ... it also drives any running animation
+        # sleeps in glfw_wait_events() while nothing is happening
         if self.glWindowType == "glfw":
             while not glfw_window_should_close(self.glWindow):
-                glfw_poll_events()
+                if self.glAnimationIsRunning:
+                    wait = self.glAnimationStep()
+                    if wait is not None and wait > 0:
+                        glfw_wait_events_timeout(wait)
+                    else:
+                        glfw_poll_events()
+                else:
+                    glfw_wait_events()
             glfw_terminate()
 
     def glfwSizeChange(self, widow, width, height):
@@ -134,6 +212,7 @@ class gl2D():
                         handlesize = 0.05, handlewidth = 3, handlecolor = [1,1,1]):
         self.glDragCallback = dragCallback
         self.glDragList = dragList
+        self.glDragIndex = gl2DPointIndex(dragList)
         self.glDragMaxDist = dragMaxDist
         self.glDragListIndex = -1
         self.glDraggingActive = True
@@ -144,6 +223,19 @@ class gl2D():
         self.glUpdate()
 
 
+    def glDragListChanged(self):
+        # call this if the drag list was changed by anything other than dragging one point
+        self.glDragIndex = gl2DPointIndex(self.glDragList)
+
+    def glDraggingSync(self):
+        # the drag callback moved the dragged point, move it in the index too
+        dl = self.glDragList
+        i = self.glDragListIndex
+        if self.glDragIndex is None or len(dl) != len(self.glDragIndex):
+            self.glDragListChanged()
+        elif 0 <= i < len(dl):
+            self.glDragIndex.move(i, dl[i][0], dl[i][1])
+
     def glStopDragging(self):
         self.glDraggingActive = False
         self.glUpdate()
@@ -152,6 +244,7 @@ class gl2D():
         if self.glDraggingActive is False: return
         if leftButtonDown and (self.glDragListIndex > -1):
             self.glDragCallback(x, y, self.glDragList, self.glDragListIndex)  # trigger the callback
+            self.glDraggingSync()
             self.glUpdate()
         else:
             self.glDragListIndex = self.closestPoint(x,y,self.glDragList, self.glDragMaxDist)
@@ -167,41 +260,39 @@ class gl2D():
 
         if index > -1: #we found a point that was close enough
             self.glDragCallback(x, y, self.glDragList, self.glDragListIndex)  # trigger the callback
+            self.glDraggingSync()
         # end function
 
 
     def glDraggingMouseButtonRelease(self,x,y,):
         if self.glDraggingActive is False: return  #not dragging
         self.glDragCallback(x, y, self.glDragList, self.glDragListIndex)  # trigger the callback
+        self.glDraggingSync()
         #end function
 
     def glDraggingShowHandles(self):
         if self.glDraggingActive is False: return  #not dragging
-        dl = self.glDragList
+        # the handles follow the live list (the callback may have moved any point),
+        # glDragIndex is only used for picking
+        points = np.asarray(self.glDragList, dtype=np.float64).reshape(-1, 2)
         hs = self.glDraggingHandleSize
         hc = self.glDraggingHandleColor
-        glColor3f(hc[0],hc[1],hc[2])
-        glLineWidth = self.glDraggingHandleWidth
-        for i in range(len(dl)):
-            if i ==self.glDragListIndex:
-                gl2DCircle(dl[i][0], dl[i][1], hs, fill=True, faces = 4)
-            else:
-                gl2DCircle(dl[i][0], dl[i][1], hs, fill = False, faces =  4)
+        # all of the handles in one draw call, the selected one filled
+        batch = self.glBatch("dragHandles")
+        batch.clear()
+        batch.addCircles(points[:, 0], points[:, 1], hs, hc, fill=False, faces=4, width=self.glDraggingHandleWidth)
+        i = self.glDragListIndex
+        if 0 <= i < len(points):
+            batch.addCircles(points[i, 0], points[i, 1], hs, hc, fill=True, faces=4)
+        batch.draw()
 
         #end function
 
     def closestPoint(self,x,y,pointlist,maxdist):
-
-        distmaxsq = maxdist
-        mindistsq = 999999999
-        index = -1
-        for i in range(len(pointlist)):
-            distsq = (x-pointlist[i][0])**2 + (y-pointlist[i][1])**2
-            if distsq < mindistsq: # a candidate
-                mindistsq = distsq
-                if mindistsq < distmaxsq:
-                    index = i
-        return index
+        # index of the point in pointlist closest to x,y ... or -1 if none is within maxdist
+        if pointlist is self.glDragList and self.glDragIndex is not None:
+            return self.glDragIndex.nearest(x, y, maxdist)  # indexed once by glStartDragging
+        return gl2DPointIndex(pointlist, gridThreshold=np.inf).nearest(x, y, maxdist)
 
 
     def glZoom(self, zoom, xcenter=None, ycenter=None):
@@ -236,73 +327,116 @@ class gl2D():
         self.glViewReady = False
         self.glUpdate()
 
-    def setupGLviewing(self):
-        if self.glViewReady is True:  return  # nothing to do
-
-        # setup the drawing window size and scaling
+    def glWindowSize(self):
         if self.glWindowType == "PyQt":
             windowWidth = self.glWindow.frameSize().width()
             windowHeight = self.glWindow.frameSize().height()
         elif self.glWindowType == "glfw":
             windowWidth, windowHeight = glfw_get_window_size(self.glWindow)
+        elif self.glWindowType == "offscreen":
+            windowWidth, windowHeight = self.glWindow.width, self.glWindow.height
+        return windowWidth, windowHeight
+
+    def glComputeView(self):
+        # the view matrices, computed with NumPy (see OpenGL_2D_view.py) ... no OpenGL needed
+        windowWidth, windowHeight = self.glWindowSize()
+        ndc, screen, viewport = gl2DViewMatrices(windowWidth, windowHeight,
+                                                 self.glXmin, self.glXmax, self.glYmin, self.glYmax,
+                                                 self.allowDistortion, self.glZoomval, self.glZoomX, self.glZoomY,
+                                                 self.glRotateval, self.glRotX, self.glRotY)
+        self.glNDCMatrix = ndc  # world -> OpenGL device coordinates
+        self.glScreenMatrix = screen  # world -> window pixels
+        self.glScreenInverse = np.linalg.inv(screen)  # window pixels (the mouse) -> world
+        self.glViewport = viewport
 
-        glViewport(1, 1, windowWidth - 1, windowHeight - 1)
-        glMatrixMode(GL_PROJECTION)
-        glLoadIdentity()
-        glMatrixMode(GL_MODELVIEW)
-        glLoadIdentity()
-        top = self.glYmax
-        bottom = self.glYmin
-        right = self.glXmax
-        left = self.glXmin
-
-        if self.allowDistortion == False:  # force no shape distortion
-            windowShape = windowWidth / windowHeight
-            drawingShape = self.glWidth / self.glHeight
-            if drawingShape > windowShape:
-                newheight = self.glHeight * drawingShape / windowShape
-                top = (top + bottom) / 2 + newheight / 2
-                bottom = top - newheight
-            else:
-                newwidth = self.glWidth * windowShape / drawingShape
-                right = (right + left) / 2 + newwidth / 2
-                left = right - newwidth
-
-        glOrtho(left, right, bottom, top, -1, 1)  # simple 2D projection
-
-        # perform zoom and rotation about the respective centers
-        glTranslatef(self.glZoomX, self.glZoomY, 0)
-        glScalef(self.glZoomval, self.glZoomval, 1)
-        glTranslatef(-self.glZoomX, -self.glZoomY, 0)
-        glTranslatef(self.glRotX, self.glRotY, 0)
-        glRotatef(self.glRotateval, 0, 0, 1)
-        glTranslatef(-self.glRotX, -self.glRotY, 0)
+    def setupGLviewing(self):
+        if self.glViewReady is True:  return  # nothing to do
 
-        # save the transformation matrices to make mouse tracking faster
-        self.glModel = glGetDoublev(GL_MODELVIEW_MATRIX)
-        self.glProjection = glGetDoublev(GL_PROJECTION_MATRIX)
-        self.glView = glGetIntegerv(GL_VIEWPORT)
+        # setup the drawing window size and scaling
+        self.glComputeView()
+        glViewport(*self.glViewport)
+        if not self.glCoreProfile:  # the fixed function matrices, for immediate mode drawing
+            glMatrixMode(GL_PROJECTION)
+            glLoadIdentity()
+            glMatrixMode(GL_MODELVIEW)
+            glLoadMatrixd(glMatrix4(self.glNDCMatrix))  # ortho projection, zoom and rotation in one matrix
+        if self.glShader is not None:
+            self.glShader.setView(self.glNDCMatrix)  # the same matrix as a shader uniform
+
+        # still here for code that calls gluUnProject itself
+        self.glModel = glMatrix4(self.glNDCMatrix)
+        self.glProjection = np.identity(4)
+        self.glView = np.array(self.glViewport)
 
         self.glViewReady = True  # all done ... until things change
 
     def paintGL(self):
         # this is a fairly generic widow setup code for 2D graphics
         # the specific drawing code should be placed in the drawCallback() function
-        # drawCallback() is called on the last line of this function
+        # drawCallback() is called near the end of this function
+        start = perf_counter()
         self.setupGLviewing()  # what it says!
         bc = self.glBackgroundColor
         glClearColor(bc[0], bc[1], bc[2], 0)  # set the background color
         glClear(GL_COLOR_BUFFER_BIT)  # clear the drawing
 
-        self.drawCallback()  # draw the user's drawing
+        shader = None
+        if self.glRenderer == "shader":
+            try:
+                shader = self.glGetShader()
+            except Exception as error:
+                if self.glCoreProfile: raise  # nothing else can draw in a core profile
+                # no GLSL 3.30 ... draw with the fixed function pipeline instead
+                warnings.warn("Shader renderer not available, using renderer='fixed': {}".format(error))
+                self.glRenderer = "fixed"
+
+        gl2DShader.current = shader  # batches, gl2DCircles() etc. draw with the shader
+        try:
+            self.drawCallback()  # draw the user's drawing
+        finally:
+            gl2DShader.current = None
+
+        if self.glTimingOverlay and not self.glCoreProfile: self.glDrawTimingOverlay()
+        self.glFrameTimer.add("draw", perf_counter() - start)
+
+    def glRenderFrame(self, animationCallback=None, frame=0, nframes=1):
+        # draw one picture and return it as a (height, width, 3) uint8 RGB array
+        # pass an animator's AnimationCallback to draw a particular frame
+        timer = self.glFrameTimer
+        timer.beginFrame()
+        if animationCallback is not None:
+            start = perf_counter()
+            animationCallback(frame, nframes)
+            timer.add("callback", perf_counter() - start)
+        self.paintGL()
+        timer.endFrame()
+        return self.glReadImage()
+
+    def glReadImage(self):
+        # the current drawing as a (height, width, 3) uint8 RGB array
+        if self.glWindowType == "offscreen":
+            return self.glWindow.readPixels()
+        glFinish()
+        (x, y, width, height) = glGetIntegerv(GL_VIEWPORT)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        data = glReadPixels(0, 0, x + width, y + height, GL_RGB, GL_UNSIGNED_BYTE)
+        image = np.frombuffer(data, dtype=np.uint8).reshape(y + height, x + width, 3)
+        return np.flipud(image).copy()
 
     def glUnProjectMouse(self, wx, wy):
-        vx = GLdouble(wx)
-        vy = self.glView[3] - GLdouble(wy)
-        vz = GLdouble(0)
-        x, y, z = gluUnProject(vx, vy, vz, model=self.glModel, proj=self.glProjection, view=self.glView)
+        # window (mouse) pixels to world coordinates ... single values or arrays of them
+        if not self.glViewReady or self.glScreenMatrix is None: self.glComputeView()
+        x, y = applyMatrix(self.glScreenInverse, wx, wy)
+        if np.ndim(x) == 0: return float(x), float(y)
         return x, y
 
+    def glProjectToScreen(self, x, y):
+        # world coordinates to window pixels, (0, 0) is the top left ... single values or arrays
+        if not self.glViewReady or self.glScreenMatrix is None: self.glComputeView()
+        wx, wy = applyMatrix(self.glScreenMatrix, x, y)
+        if np.ndim(wx) == 0: return float(wx), float(wy)
+        return wx, wy
+
     def glHandleMouseEvents(self,event):
         type = event.type()
         if type in (QEvent.MouseMove, QEvent.MouseButtonPress, QEvent.MouseButtonRelease):
@@ -337,11 +471,76 @@ class gl2D():
         self.glMouseTextBox = textbox
 
 
+    def glBatch(self, name, usage=GL_DYNAMIC_DRAW):
+        # get (or create) a named retained mode batch
+        # fill it with batch.addLines(), addLineStrip(), addPolygon(), addCircles()
+        # and draw it from the drawCallback() with batch.draw()
+        if name not in self.glBatches:
+            self.glBatches[name] = gl2DBatch(usage)
+        return self.glBatches[name]
+
+    def glDeleteBatch(self, name):
+        batch = self.glBatches.pop(name, None)
+        if batch is not None: batch.delete()
+
+    def glLayer(self, name):
+        # get (or create) a named static layer
+        # draw it from the drawCallback() with layer.draw(drawFunction, key)
+        # layers are recorded in world coordinates, so panning and zooming just replay them
+        # they are recorded again when the key changes, or after glInvalidateLayers()
+        if name not in self.glLayers:
+            self.glLayers[name] = gl2DLayer()
+        return self.glLayers[name]
+
+    def glDeleteLayer(self, name):
+        layer = self.glLayers.pop(name, None)
+        if layer is not None: layer.delete()
+
+    def glInvalidateLayers(self):
+        # record all of the named layers again (after a change of data)
+        for layer in self.glLayers.values():
+            layer.invalidate()
+
+
+    def glGetShader(self):
+        # the gl2DShader of this window (created on first use, needs the GL context to be current)
+        # draw with shader.drawCircles(), drawArrows(), drawJoints() from the drawCallback()
+        if self.glShader is None:
+            self.glShader = gl2DShader()
+            if self.glNDCMatrix is not None: self.glShader.setView(self.glNDCMatrix)
+        return self.glShader
+
+
+    def glEnableTiming(self, overlay=False, capacity=None):
+        # start recording frame times, returns the gl2DFrameTimer  (see OpenGL_2D_timing.py)
+        # overlay=True shows fps and frame time percentiles in the top left corner of the window
+        if capacity is not None and capacity != self.glFrameTimer.capacity:
+            self.glFrameTimer = gl2DFrameTimer(capacity)
+        self.glFrameTimer.enabled = True
+        self.glTimingOverlay = overlay
+        return self.glFrameTimer
+
+    def glDisableTiming(self):
+        self.glFrameTimer.enabled = False
+        self.glFrameTimer.endFrame()
+        self.glTimingOverlay = False
+
+    def glDrawTimingOverlay(self):
+        # the timing numbers, placed in window pixels so they stay put when zooming
+        x, y = self.glUnProjectMouse(10, 8)
+        x1, y1 = self.glUnProjectMouse(10, 8 + 16)
+        self.glFrameTimer.drawOverlay(x, y, np.hypot(x1 - x, y1 - y))
+
+
     #def glEnableMouseInteraction(self):
 
     def glStartAnimation(self, drawfunc, nframes,
                          delaytime=0, repeat=False, reverse=False, reset = True,
-                         RestartDraggingCallback = None, reverseDelayTime = 0):
+                         RestartDraggingCallback = None, reverseDelayTime = 0,
+                         fps = None, duration = None):
+        # frame timing:  fps sets a target frame rate,  duration sets the time (in seconds)
+        # for one pass through all of the frames.  Otherwise each frame lasts delaytime seconds.
+        # Frames are skipped (and counted in glAnimationDroppedFrames) if drawing falls behind
 
         if self.glAnimationIsRunning is True:  return  # don't want multiple copies
 
@@ -355,6 +554,14 @@ class gl2D():
         self.glAnimationReverse = reverse
         self.glAnimationReset = reset
         self.glAnimationReversed = False
+        if fps is not None and fps > 0:
+            self.glAnimationFrameTime = 1.0 / fps
+        elif duration is not None and nframes > 0:
+            self.glAnimationFrameTime = duration / nframes
+        else:
+            self.glAnimationFrameTime = delaytime
+        self.glAnimationFramesShown = 0
+        self.glAnimationDroppedFrames = 0
 
 
         #handle Dragging interaction with animation
@@ -367,11 +574,13 @@ class gl2D():
             self.glRestartDraggingCallback(False)
 
         # Start the animation with current parameters
+        # nothing blocks here:  the QTimer (PyQt) or glWait() (GLFW) draws the frames
         self.glAnimationIsRunning = True
-        self.glAnimate()
-        self.glAnimationIsRunning = False
+        self.glAnimationRestartClock()
+        self.glAnimationSchedule(0)
 
     def glStopAnimation(self):
+        if self.glAnimationTimer is not None: self.glAnimationTimer.stop()
         if self.glAnimationCallback is None:  return
         if self.glAnimationReset is True: # reset the image to the first frame
             self.glAnimationCallback(0, self.glAnimationNFrames)  # call the callback function
@@ -392,58 +601,114 @@ class gl2D():
         # Start the animation with current parameters
         if self.glAnimationIsRunning is True:
             self.glAnimationIsRunning = False
+            if self.glAnimationTimer is not None: self.glAnimationTimer.stop()
         else:
             self.glAnimationIsRunning = True
-            self.glAnimate()
+            self.glAnimationRestartClock()
+            self.glAnimationSchedule(0)
 
-    def glAnimate(self):
-
-        # use shorter names ... less typing
+    def glSeekAnimation(self, frame):
+        # continue the animation from a new frame  (e.g. from a frame slider)
+        if self.glAnimationCallback is None:  return
+        frame = int(min(max(frame, 0), self.glAnimationNFrames - 1))
+        if frame == self.glAnimationCurrentFrame:  return
+        self.glAnimationCurrentFrame = frame
+        self.glAnimationRestartClock()
+
+    def glAnimationRestartClock(self):
+        self.glAnimationStartTime = monotonic()
+        self.glAnimationTickCount = 0
+
+    def glAnimationSchedule(self, wait):
+        # ask the PyQt event loop to call glAnimationTimerEvent() in wait seconds
+        if self.glWindowType != "PyQt": return  # glWait() polls glAnimationStep()
+        if self.glAnimationTimer is None:
+            self.glAnimationTimer = QTimer()
+            self.glAnimationTimer.setSingleShot(True)
+            self.glAnimationTimer.setTimerType(Qt.PreciseTimer)
+            self.glAnimationTimer.timeout.connect(self.glAnimationTimerEvent)
+        self.glAnimationTimer.start(int(round(wait * 1000)))
+
+    def glAnimationTimerEvent(self):
+        wait = self.glAnimationStep()
+        if wait is not None:
+            self.glAnimationSchedule(wait)
+
+    def glAnimationNextFrame(self):
+        # the frame (and direction) that follows the current one
+        # returns None when the animation is over
         maxIndex = self.glAnimationNFrames
-        repeat = self.glAnimationRepeat
-        reverse = self.glAnimationReverse
-
-        if self.glAnimationReversed is True:
-            step = -1
-            theEnd = -1
+        frame = self.glAnimationCurrentFrame
+        backward = self.glAnimationReversed
+
+        if backward is True:
+            frame -= 1
+            if frame == -1:  # back at the beginning
+                if self.glAnimationRepeat is False: return None
+                frame = 0
+                backward = False
         else:
-            step = 1
-            theEnd = maxIndex
-
-        while self.glAnimationCurrentFrame != theEnd:
-
-            if self.glAnimationIsRunning is False:
-                return  # the animation was stopped
-
-
-            self.glAnimationCallback(self.glAnimationCurrentFrame, self.glAnimationNFrames)  # call the callback function
-            self.glUpdate()
-
-            sleep(self.glAnimationDelayTime)  # and sleep as directed
-
-            self.glAnimationCurrentFrame += step
-
-            if self.glAnimationCurrentFrame == theEnd:  # at the end, what now??
+            frame += 1
+            if frame == maxIndex:  # at the end, what now??
+                if self.glAnimationReverse is True:  # then move in reverse
+                    frame = maxIndex - 2  # dont repeat the last step
+                    backward = True
+                    if frame < 0: return None
+                elif self.glAnimationRepeat is True:  # want to repeat forever!
+                    frame = 0  # start over
+                else:
+                    return None
+        return frame, backward
+
+    def glAnimationStep(self):
+        # draw the current frame if it is due and move on to the next one
+        # frame k is due at glAnimationStartTime + k * frameTime on the monotonic clock
+        # returns the seconds until the next frame is due, or None if the animation is not running
+        if self.glAnimationIsRunning is False: return None
+        frameTime = self.glAnimationFrameTime
+
+        if frameTime > 0:
+            now = monotonic()
+            due = self.glAnimationStartTime + self.glAnimationTickCount * frameTime
+            if now < due: return due - now  # too early
+
+            # skip frames that are already late, but always show the final frame
+            behind = int((now - self.glAnimationStartTime) / frameTime) - self.glAnimationTickCount
+            while behind > 0:
+                nextFrame = self.glAnimationNextFrame()
+                if nextFrame is None: break
+                (self.glAnimationCurrentFrame, self.glAnimationReversed) = nextFrame
+                self.glAnimationDroppedFrames += 1
+                self.glAnimationTickCount += 1
+                behind -= 1
+
+        timer = self.glFrameTimer
+        timer.beginFrame()
+        start = perf_counter()
+        self.glAnimationCallback(self.glAnimationCurrentFrame, self.glAnimationNFrames)  # call the callback function
+        timer.add("callback", perf_counter() - start)
+        self.glUpdate()
+        timer.endFrame()
+        self.glAnimationFramesShown += 1
+        if self.glAnimationIsRunning is False: return None  # the animation was stopped
 
-                if reverse is True:
-                    if self.glAnimationReversed is False:  # then move in reverse
-                        step = -1
-                        theEnd = -1
-                        self.glAnimationCurrentFrame = maxIndex - 2  # dont repeat the last step
-                        self.glAnimationReversed = True
+        nextFrame = self.glAnimationNextFrame()
+        if nextFrame is None:
+            self.glStopAnimation() #animation is over
+            return None
+        (self.glAnimationCurrentFrame, self.glAnimationReversed) = nextFrame
+        self.glAnimationTickCount += 1
 
-                if repeat is True:  # want to repeat forever!
-                    if reverse is False:  # then we can't be at the beginning point
-                        self.glAnimationCurrentFrame = 0  # start over
-                    elif reverse is True:  # animation is reversible
-                        if self.glAnimationCurrentFrame == -1:  # back at the beginning
-                            step = 1
-                            theEnd = maxIndex
-                            self.glAnimationCurrentFrame = 0
-                            self.glAnimationReversed = False
-        # end while loop
+        if frameTime <= 0: return 0  # as fast as possible
+        due = self.glAnimationStartTime + self.glAnimationTickCount * frameTime
+        return max(due - monotonic(), 0)
 
-        self.glStopAnimation() #animation is over
+    def glAnimate(self):
+        # blocking playback, for scripts that have no event loop running
+        while self.glAnimationIsRunning is True:
+            wait = self.glAnimationStep()
+            if wait is None: break
+            if wait > 0: sleep(wait)  # until the next frame is due
 
 
 #end of the GL2D class definition
@@ -458,48 +723,45 @@ def gl2DText(text, x, y, font=GLUT_BITMAP_HELVETICA_18):
 
 
 def gl2DCircle(xcenter, ycenter, radius, fill=False, faces=24):
-    theta = 0
-
-    if fill:
-        glBegin(GL_POLYGON)
-    else:
-        glBegin(GL_LINE_STRIP)
-
-    glVertex2f(xcenter + np.cos(theta) * radius, ycenter + np.sin(theta) * radius)
-    for i in range(1, faces + 1):
-        theta = i / faces * 2 * np.pi
-        glVertex2f(xcenter + np.cos(theta) * radius, ycenter + np.sin(theta) * radius)
-    glEnd();
+    # xcenter, ycenter and radius may also be arrays, to draw many circles with one call
+    fixedShapes(arcTable(faces), GL_POLYGON if fill else GL_LINE_STRIP, xcenter, ycenter, radius)
 
 def gl2DArc(xcenter, ycenter, radius, startDeg, stopDeg, faces=24):
-    start = startDeg * np.pi/180
-    delta = 1 / faces * (stopDeg - startDeg) * np.pi/180
-
-    theta = start
-    glBegin(GL_LINE_STRIP)
-    glVertex2f(xcenter + np.cos(theta) * radius, ycenter + np.sin(theta) * radius);
-    for i in range(1, faces + 1):
-        theta +=  delta
-        glVertex2f(xcenter + np.cos(theta) * radius, ycenter + np.sin(theta) * radius);
-    glEnd();
+    # xcenter, ycenter and radius may also be arrays, to draw many arcs with one call
+    fixedShapes(arcTable(faces, startDeg, stopDeg), GL_LINE_STRIP, xcenter, ycenter, radius)
 
 def gl2DArrow(xtip, ytip, size, angleDeg = 0, widthDeg = 60, toCenter = False, fill=True):
-    theta = angleDeg * np.pi/180
-    delta = (180 - widthDeg) * np.pi/180
-    xcenter = xtip - size * np.cos(theta)
-    ycenter = ytip - size * np.sin(theta)
-
-    if fill:
-        glBegin(GL_POLYGON)
+    # xtip, ytip, size and angleDeg may also be arrays, to draw many arrowheads with one call
+    points, mode = unitArrow(widthDeg, toCenter, fill=False)  # the outline, tip to tip
+    fixedShapes(points, GL_POLYGON if fill else GL_LINE_STRIP, xtip, ytip, size, np.radians(angleDeg))
+
+def gl2DCircles(xcenter, ycenter, radius, color=None, fill=False, faces=24, width=None):
+    # any number of circles in ONE draw call ... instanced on the GPU with renderer="shader"
+    # xcenter, ycenter and radius may be single values or arrays
+    # color is one rgb value, one rgb value per circle, or None for the current glColor
+    shader = gl2DShader.current
+    if shader is not None:
+        shader.drawCircles(xcenter, ycenter, radius, color, fill, faces, width)
     else:
-        glBegin(GL_LINE_STRIP)
+        fixedShapes(*unitCircle(faces, fill), xcenter, ycenter, radius, None, color, width)
 
-    glVertex2f(xcenter + np.cos(theta) * size, ycenter + np.sin(theta) * size)
-    glVertex2f(xcenter + np.cos(theta+delta) * size, ycenter + np.sin(theta+delta) * size)
-    if toCenter is True:
-        glVertex2f(xcenter, ycenter)
-    glVertex2f(xcenter + np.cos(theta-delta) * size, ycenter + np.sin(theta-delta) * size)
-    glVertex2f(xcenter + np.cos(theta) * size, ycenter + np.sin(theta) * size)
-
-    glEnd()
+def gl2DArrows(xtip, ytip, size, angleDeg=0, widthDeg=60, toCenter=False, fill=True, color=None, width=None):
+    # any number of arrowheads in ONE draw call, the same shapes as gl2DArrow()
+    shader = gl2DShader.current
+    if shader is not None:
+        shader.drawArrows(xtip, ytip, size, angleDeg, color, widthDeg, toCenter, fill, width)
+    else:
+        fixedShapes(*unitArrow(widthDeg, toCenter, fill), xtip, ytip, size, np.radians(angleDeg), color, width)
 
+def gl2DJoints(x, y, radius, color=(1, 1, 1), edgeColor=(0, 0, 0), edge=0.2, faces=24):
+    # pin joints (a filled circle with a ring of edgeColor) in ONE draw call
+    shader = gl2DShader.current
+    if shader is not None:
+        shader.drawJoints(x, y, radius, color, edgeColor, edge, faces)
+    else:
+        x, y, radius = np.broadcast_arrays(np.atleast_1d(x), y, radius)
+        n = len(x)
+        colors = np.concatenate((np.broadcast_to(np.reshape(edgeColor, (-1, 3)), (n, 3)),
+                                 np.broadcast_to(np.reshape(color, (-1, 3)), (n, 3))))
+        fixedShapes(*unitCircle(faces, True), np.tile(x, 2), np.tile(y, 2),
+                    np.concatenate((radius, radius*(1 - edge))), None, colors)
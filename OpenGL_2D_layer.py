@@ -0,0 +1,52 @@
+'''
+Static layers for the gl2D class
+    Parts of a picture that don't move during an animation (boundaries, ghost positions,
+    construction lines, ...) are recorded ONCE in an OpenGL display list and then replayed
+    every frame with a single glCallList(), so only the moving parts cost anything per frame.
+
+    Typical use inside a drawCallback():
+        layer.draw(self.DrawBoundaries, key=(self.dataVersion, self.xmin, self.xmax))
+    The drawing function runs (and is recorded) the first time, and again whenever the key
+    changes or the layer is invalidated.  Any immediate mode drawing can be recorded:
+    glBegin/glEnd, colors, line widths and stipples, gl2DCircle(), gl2DBatch.draw() ...
+    Recording always uses the fixed function pipeline, so layers need a compatibility profile context
+'''
+
+from OpenGL.GL import *
+
+from OpenGL_2D_shader import gl2DShader
+
+
+class gl2DLayer():
+
+    def __init__(self):
+        self.displayList = None
+        self.key = None  # what the recording was made from
+        self.valid = False
+
+    def invalidate(self):
+        # record again on the next draw()
+        self.valid = False
+
+    def draw(self, drawFunction, key=None):
+        if self.valid and key == self.key:
+            glCallList(self.displayList)  # replay the recording
+            return
+        if self.displayList is None:
+            self.displayList = glGenLists(1)
+        shader = gl2DShader.current
+        gl2DShader.current = None  # programs and vertex array objects don't record into lists
+        glNewList(self.displayList, GL_COMPILE_AND_EXECUTE)  # record and draw at the same time
+        try:
+            drawFunction()
+        finally:
+            glEndList()
+            gl2DShader.current = shader
+        self.key = key
+        self.valid = True
+
+    def delete(self):
+        if self.displayList is not None:
+            glDeleteLists(self.displayList, 1)
+            self.displayList = None
+        self.valid = False
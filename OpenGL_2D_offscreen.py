@@ -0,0 +1,127 @@
+'''
+Offscreen (headless) OpenGL contexts for the gl2D class
+    Used by gl2D(windowType="offscreen") to draw without any window or display.
+    Pictures are drawn into an offscreen framebuffer and read back as NumPy RGB arrays.
+
+    PyOpenGL picks its platform when OpenGL is FIRST imported, so the environment variable
+    PYOPENGL_PLATFORM must be set to "osmesa" (software rendering) or "egl" (GPU or Mesa llvmpipe)
+    before anything imports OpenGL.  For example:
+        import os
+        os.environ["PYOPENGL_PLATFORM"] = "egl"
+        from OpenGL_2D_class_GLFW import gl2D
+    coreProfile=True asks for an OpenGL 3.3 core profile context (EGL only), for gl2D(renderer="shader")
+'''
+
+import ctypes
+import os
+import numpy as np
+
+from OpenGL.GL import *
+
+
+class offscreenContext():
+
+    def __init__(self, width=1200, height=600, coreProfile=False):
+        self.width = width
+        self.height = height
+        self.coreProfile = coreProfile  # no fixed function pipeline at all
+        self.platform = os.environ.get("PYOPENGL_PLATFORM", "").lower()
+
+        # platform specific handles
+        self.osmesaContext = None
+        self.osmesaBuffer = None
+        self.eglDisplay = None
+        self.eglSurface = None
+        self.eglContext = None
+
+        if self.platform == "osmesa":
+            if coreProfile:
+                raise RuntimeError("core profile offscreen contexts need PYOPENGL_PLATFORM set to \"egl\"")
+            self.createOSMesa()
+        elif self.platform == "egl":
+            self.createEGL()
+        else:
+            raise RuntimeError('Offscreen drawing needs PYOPENGL_PLATFORM set to "osmesa" or "egl" '
+                               'before OpenGL is imported')
+
+    def createOSMesa(self):
+        from OpenGL import osmesa
+        from OpenGL import arrays
+        self.osmesaContext = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 0, 0, None)
+        if not self.osmesaContext:
+            raise RuntimeError("OSMesa context creation failed")
+        self.osmesaBuffer = arrays.GLubyteArray.zeros((self.height, self.width, 4))
+        self.makeCurrent()
+
+    def createEGL(self):
+        from OpenGL import EGL
+        if not os.environ.get("DISPLAY") and not os.environ.get("WAYLAND_DISPLAY"):
+            os.environ.setdefault("EGL_PLATFORM", "surfaceless")  # Mesa: no X server to connect to
+        self.eglDisplay = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        major, minor = EGL.EGLint(), EGL.EGLint()
+        if not EGL.eglInitialize(self.eglDisplay, ctypes.pointer(major), ctypes.pointer(minor)):
+            raise RuntimeError("EGL initialization failed")
+
+        configAttribs = [EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+                         EGL.EGL_RED_SIZE, 8, EGL.EGL_GREEN_SIZE, 8, EGL.EGL_BLUE_SIZE, 8,
+                         EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+                         EGL.EGL_NONE]
+        configAttribs = (EGL.EGLint * len(configAttribs))(*configAttribs)
+        config = EGL.EGLConfig()
+        nconfigs = EGL.EGLint()
+        EGL.eglChooseConfig(self.eglDisplay, configAttribs, ctypes.pointer(config), 1, ctypes.pointer(nconfigs))
+        if nconfigs.value < 1:
+            raise RuntimeError("EGL found no pbuffer configuration for desktop OpenGL")
+
+        surfaceAttribs = [EGL.EGL_WIDTH, self.width, EGL.EGL_HEIGHT, self.height, EGL.EGL_NONE]
+        surfaceAttribs = (EGL.EGLint * len(surfaceAttribs))(*surfaceAttribs)
+        try:
+            self.eglSurface = EGL.eglCreatePbufferSurface(self.eglDisplay, config, surfaceAttribs)
+            error = None if self.eglSurface else EGL.eglGetError()  # EGL_NO_SURFACE
+        except EGL.EGLError as failure:  # PyOpenGL's error checking read the error first
+            self.eglSurface, error = None, failure.err
+        if error is not None:
+            raise RuntimeError("EGL pbuffer surface creation failed ({}x{}), EGL error 0x{:04x}".format(
+                self.width, self.height, int(error)))
+
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)  # desktop OpenGL, so the fixed function calls still work
+        contextAttribs = None
+        if self.coreProfile:
+            contextAttribs = [EGL.EGL_CONTEXT_MAJOR_VERSION, 3, EGL.EGL_CONTEXT_MINOR_VERSION, 3,
+                              EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK, EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT,
+                              EGL.EGL_NONE]
+            contextAttribs = (EGL.EGLint * len(contextAttribs))(*contextAttribs)
+        self.eglContext = EGL.eglCreateContext(self.eglDisplay, config, EGL.EGL_NO_CONTEXT, contextAttribs)
+        if not self.eglContext:
+            raise RuntimeError("EGL context creation failed")
+        self.makeCurrent()
+
+    def makeCurrent(self):
+        if self.platform == "osmesa":
+            from OpenGL import osmesa
+            osmesa.OSMesaMakeCurrent(self.osmesaContext, self.osmesaBuffer, GL_UNSIGNED_BYTE,
+                                     self.width, self.height)
+        else:
+            from OpenGL import EGL
+            EGL.eglMakeCurrent(self.eglDisplay, self.eglSurface, self.eglSurface, self.eglContext)
+
+    def readPixels(self):
+        # the finished picture as a (height, width, 3) uint8 array, top row first
+        glFinish()
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        data = glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE)
+        image = np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, 3)
+        return np.flipud(image).copy()  # OpenGL rows start at the bottom
+
+    def destroy(self):
+        if self.platform == "osmesa" and self.osmesaContext is not None:
+            from OpenGL import osmesa
+            osmesa.OSMesaDestroyContext(self.osmesaContext)
+            self.osmesaContext = None
+        elif self.platform == "egl" and self.eglContext is not None:
+            from OpenGL import EGL
+            EGL.eglMakeCurrent(self.eglDisplay, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+            EGL.eglDestroySurface(self.eglDisplay, self.eglSurface)
+            EGL.eglDestroyContext(self.eglDisplay, self.eglContext)
+            EGL.eglTerminate(self.eglDisplay)
+            self.eglContext = None
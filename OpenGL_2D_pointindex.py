@@ -0,0 +1,88 @@
+'''
+Fast "which point is closest to the mouse" lookups for the gl2D class
+    Used for the drag handles:  gl2D.glStartDragging() indexes the drag list once,
+    then every mouse move is a lookup instead of a Python loop over every handle.
+
+    Short lists are simply checked all at once with NumPy.
+    Long lists are sorted into a uniform grid of square cells, and a lookup only checks the
+    cells within maxdist of the mouse.  Moving one point (while it is dragged) only moves
+    it from one cell to another, the rest of the grid is untouched.
+
+        index = gl2DPointIndex(points)
+        i = index.nearest(x, y, maxdist)    # -1 if nothing is within maxdist
+        index.move(i, newx, newy)
+'''
+
+import numpy as np
+
+
+class gl2DPointIndex():
+
+    def __init__(self, points=None, gridThreshold=256, cellsize=None):
+        self.gridThreshold = gridThreshold  # use the grid for this many points or more
+        self.cellsize = cellsize  # None picks about 2 points per cell
+        self.points = np.zeros((0, 2))
+        self.cells = None  # (i, j) cell -> array of point indices, None if there is no grid
+        self.cellOf = None  # the cell of each point
+        self.build(points if points is not None else [])
+
+    def __len__(self):
+        return len(self.points)
+
+    def build(self, points):
+        # index a new list of points, anything that looks like [[x, y], [x, y], ...]
+        self.points = np.array(points, dtype=np.float64).reshape(-1, 2)
+        n = len(self.points)
+        self.cells = None
+        self.cellOf = None
+        if n < self.gridThreshold: return
+
+        cellsize = self.cellsize
+        if cellsize is None:
+            span = np.ptp(self.points, axis=0)
+            span = np.maximum(span, max(span.max(), 1e-12)/np.sqrt(n))  # points along a line still get cells
+            area = span[0]*span[1]
+            cellsize = np.sqrt(2*area/n)
+        self.size = float(cellsize) if cellsize > 0 else 1.0
+
+        # group the point indices by cell, all at once
+        cellOf = np.floor(self.points/self.size).astype(np.int64)
+        order = np.lexsort((cellOf[:, 1], cellOf[:, 0]))
+        sortedCells = cellOf[order]
+        starts = np.flatnonzero(np.any(np.diff(sortedCells, axis=0) != 0, axis=1)) + 1
+        self.cells = {(int(c[0]), int(c[1])): group
+                      for c, group in zip(sortedCells[np.r_[0, starts]], np.split(order, starts))}
+        self.cellOf = cellOf
+
+    def move(self, i, x, y):
+        # point i moved to x, y
+        self.points[i] = (x, y)
+        if self.cells is None: return
+        old = (int(self.cellOf[i, 0]), int(self.cellOf[i, 1]))
+        new = (int(np.floor(x/self.size)), int(np.floor(y/self.size)))
+        if new == old: return
+        group = self.cells[old]
+        group = group[group != i]
+        if len(group): self.cells[old] = group
+        else: del self.cells[old]
+        self.cells[new] = np.append(self.cells.get(new, np.zeros(0, dtype=np.intp)), i)
+        self.cellOf[i] = new
+
+    def nearest(self, x, y, maxdist=None):
+        # index of the point closest to x, y, or -1 if none is closer than maxdist
+        if len(self.points) == 0: return -1
+        candidates = None
+        if self.cells is not None and maxdist is not None and np.isfinite(maxdist):
+            reach = int(np.ceil(maxdist/self.size))
+            if (2*reach + 1)**2 < len(self.cells):  # otherwise checking everything is quicker
+                ci, cj = int(np.floor(x/self.size)), int(np.floor(y/self.size))
+                groups = [self.cells[(i, j)] for i in range(ci - reach, ci + reach + 1)
+                          for j in range(cj - reach, cj + reach + 1) if (i, j) in self.cells]
+                if len(groups) == 0: return -1
+                candidates = np.concatenate(groups)
+
+        points = self.points if candidates is None else self.points[candidates]
+        distsq = (points[:, 0] - x)**2 + (points[:, 1] - y)**2
+        best = int(np.argmin(distsq))
+        if maxdist is not None and not distsq[best] < maxdist**2: return -1
+        return best if candidates is None else int(candidates[best])
@@ -0,0 +1,344 @@
+'''
+Shader (programmable pipeline) drawing for the gl2D class
+    One small GLSL program replaces the fixed function pipeline:  the gl2D view is a single
+    3x3 matrix uniform (glNDCMatrix, see OpenGL_2D_view.py) and everything is drawn from vertex
+    buffers, so no glBegin/glEnd, glMatrixMode or glColor calls are needed.  It runs on
+    core profile (OpenGL 3.3+) contexts as well as the usual compatibility contexts.
+
+    Repeated shapes (circles, arrowheads, joints) are drawn with INSTANCING:  a unit shape is
+    uploaded once, and each copy only needs a center, a size, an angle and a color.
+    Ten thousand circles are one draw call.
+
+    Turned on with gl2D(..., renderer="shader"), then inside a drawCallback():
+        shader = gl2D.glGetShader()
+        shader.drawCircles(xarray, yarray, radius, colors, fill=True)
+        shader.drawArrows(xtips, ytips, size, anglesDeg, color=(1, 0, 0))
+        shader.drawJoints(xarray, yarray, radius, color=(1, 1, 1), edgeColor=(0, 0, 0))
+    gl2DBatch.draw() uses the shader automatically, so existing batch drawing needs no changes.
+    Immediate mode drawing still works in compatibility contexts, gl2D keeps the fixed function
+    matrices loaded for it.
+
+    gl2DCircles(), gl2DArrows() and gl2DJoints() (in OpenGL_2D_class_GLFW.py) are instanced with
+    renderer="shader".  With renderer="fixed" they use fixedShapes() instead, one vertex array that
+    follows the modelview matrix (glPushMatrix, glTranslate ...) like any other fixed function drawing.
+    The unit shapes come from memoized tables (arcTable(), unitArrow()), which the immediate mode
+    gl2DCircle(), gl2DArc() and gl2DArrow() also use, through fixedShapes().
+'''
+
+import ctypes
+import math
+from functools import lru_cache
+import numpy as np
+
+from OpenGL.GL import *
+
+
+def compileShader(source, shaderType):
+    shader = glCreateShader(shaderType)
+    glShaderSource(shader, source)
+    glCompileShader(shader)
+
+    # Check for compilation errors
+    if not glGetShaderiv(shader, GL_COMPILE_STATUS):
+        log = glGetShaderInfoLog(shader).decode()
+        glDeleteShader(shader)  # nothing is left behind by a failed compile
+        raise RuntimeError(log)
+    return shader
+
+
+def createShaderProgram(vertexSource, fragmentSource, attributes=('position', 'node')):
+    vertexShader = compileShader(vertexSource, GL_VERTEX_SHADER)
+    try:
+        fragmentShader = compileShader(fragmentSource, GL_FRAGMENT_SHADER)
+    except RuntimeError:
+        glDeleteShader(vertexShader)
+        raise
+
+    program = glCreateProgram()
+    glAttachShader(program, vertexShader)
+    glAttachShader(program, fragmentShader)
+    for location, name in enumerate(attributes):
+        glBindAttribLocation(program, location, name)
+    glLinkProgram(program)
+
+    # the program keeps what it needs, the shader objects can go either way
+    glDeleteShader(vertexShader)
+    glDeleteShader(fragmentShader)
+
+    # Check for linking errors
+    if not glGetProgramiv(program, GL_LINK_STATUS):
+        log = glGetProgramInfoLog(program).decode()
+        glDeleteProgram(program)
+        raise RuntimeError(log)
+    return program
+
+
+# the tables are memoized, the least recently used ones are dropped when there are too many
+# (arcs with computed start and stop angles can make a new table every frame)
+TABLE_CACHE_SIZE = 64
+
+
+@lru_cache(maxsize=TABLE_CACHE_SIZE)
+def arcTable(faces=24, startDeg=0.0, stopDeg=360.0):
+    # faces + 1 points on a unit circle from startDeg to stopDeg, as a read only (faces + 1, 2) array
+    theta = np.radians(startDeg) + np.arange(faces + 1)*(np.radians(stopDeg - startDeg)/faces)
+    table = np.stack((np.cos(theta), np.sin(theta)), axis=1)
+    table.flags.writeable = False  # shared by every caller
+    return table
+
+
+@lru_cache(maxsize=TABLE_CACHE_SIZE)
+def unitCircle(faces=24, fill=False):
+    # a circle of radius 1 around (0, 0) ... the same points gl2DCircle() draws
+    ring = arcTable(faces)
+    if fill:
+        points = np.vstack(([[0.0, 0.0]], ring))
+        points.flags.writeable = False
+        return points, GL_TRIANGLE_FAN
+    return ring, GL_LINE_STRIP
+
+
+@lru_cache(maxsize=TABLE_CACHE_SIZE)
+def unitArrow(widthDeg=60, toCenter=False, fill=True):
+    # an arrowhead of size 1 with its tip at (0, 0), pointing along +x ... the same shape as gl2DArrow()
+    delta = (180 - widthDeg)*np.pi/180
+    points = [[0.0, 0.0], [np.cos(delta) - 1, np.sin(delta)]]
+    if toCenter is True:
+        points.append([-1.0, 0.0])
+    points.extend([[np.cos(delta) - 1, -np.sin(delta)], [0.0, 0.0]])
+    points = np.array(points)
+    points.flags.writeable = False
+    if fill:
+        return points[:-1], GL_TRIANGLE_FAN  # a fan from the tip, also right for the notched (toCenter) arrow
+    return points, GL_LINE_STRIP
+
+
+def fixedShapes(points, mode, x, y, scale=1.0, angle=None, color=None, width=None):
+    # copies of a unit shape (scaled, turned by angle radians, moved to x, y)
+    # all of the copies are one vertex array and one glMultiDrawArrays(), but each is still its
+    # own primitive (line strips don't join up, polygons stay polygons), so it can be recorded in a layer
+    # color is one rgb value or one per copy, None for the current glColor;  width None keeps the line width
+    k = len(points)
+    if all(isinstance(v, (int, float, np.number)) for v in (x, y, scale)) and \
+            (angle is None or isinstance(angle, (int, float, np.number))):
+        # just one shape, the usual case ... skip the array bookkeeping
+        n = 1
+        if angle is None:
+            vertices = points*scale + (x, y)
+        else:
+            c, s = math.cos(angle)*scale, math.sin(angle)*scale
+            vertices = points @ np.array([[c, s], [-s, c]]) + (x, y)
+    else:
+        x, y, scale = np.broadcast_arrays(np.atleast_1d(np.asarray(x, dtype=np.float64)),
+                                          np.asarray(y, dtype=np.float64),
+                                          np.asarray(scale, dtype=np.float64))
+        n = len(x)
+        if n == 0: return
+        if angle is None:
+            c, s = scale, np.zeros_like(scale)
+        else:
+            angle = np.broadcast_to(np.asarray(angle, dtype=np.float64), x.shape)
+            c, s = np.cos(angle)*scale, np.sin(angle)*scale
+        vertices = np.empty((n, k, 2))
+        vertices[:, :, 0] = x[:, None] + c[:, None]*points[:, 0] - s[:, None]*points[:, 1]
+        vertices[:, :, 1] = y[:, None] + s[:, None]*points[:, 0] + c[:, None]*points[:, 1]
+
+    styled = color is not None or width is not None
+    if styled:
+        glPushAttrib(GL_CURRENT_BIT | GL_LINE_BIT)  # the color array changes the current color
+        if width is not None: glLineWidth(width)
+    glPushClientAttrib(GL_CLIENT_VERTEX_ARRAY_BIT)  # leave the caller's arrays alone
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glVertexPointer(2, GL_DOUBLE, 0, vertices)
+    if color is not None:
+        colors = np.broadcast_to(np.asarray(color, dtype=np.float32).reshape(-1, 3), (n, 3))
+        glEnableClientState(GL_COLOR_ARRAY)
+        glColorPointer(3, GL_FLOAT, 0, np.ascontiguousarray(np.repeat(colors, k, axis=0)))
+    if n == 1:
+        glDrawArrays(mode, 0, k)
+    else:
+        glMultiDrawArrays(mode, np.arange(0, n*k, k, dtype=np.int32), np.full(n, k, dtype=np.int32), n)
+    glPopClientAttrib()
+    if styled: glPopAttrib()
+
+
+class gl2DShader():
+
+    VERTEX_SHADER = """
+    #version 330 core
+    in vec2 position;   // world coordinates, or the unit shape when instanced
+    in vec3 color;      // per vertex, or per instance
+    in vec2 center;     // per instance
+    in float scale;     // per instance
+    in float angle;     // per instance, radians
+    uniform mat3 view;
+    uniform bool instanced;
+    out vec3 vertexColor;
+
+    void main() {
+        vec2 p = position;
+        if (instanced) {
+            float c = cos(angle);
+            float s = sin(angle);
+            p = center + mat2(c, s, -s, c) * (position * scale);
+        }
+        gl_Position = vec4((view * vec3(p, 1.0)).xy, 0.0, 1.0);
+        vertexColor = color;
+    }
+    """
+
+    FRAGMENT_SHADER = """
+    #version 330 core
+    in vec3 vertexColor;
+    out vec4 fragmentColor;
+
+    void main() {
+        fragmentColor = vec4(vertexColor, 1.0);
+    }
+    """
+
+    current = None  # the shader of the gl2D window being painted with renderer="shader", set by gl2D.paintGL()
+
+    def __init__(self):
+        # needs the GL context to be current
+        self.program = createShaderProgram(self.VERTEX_SHADER, self.FRAGMENT_SHADER,
+                                           attributes=('position', 'color', 'center', 'scale', 'angle'))
+        self.uniforms = {name: glGetUniformLocation(self.program, name) for name in ('view', 'instanced')}
+        self.vao = glGenVertexArrays(1)  # core profiles can't draw without one
+        self.instanceVBO = glGenBuffers(1)  # center, scale, angle, color of each instance
+        self.templates = {}  # (shape, options) -> (vbo, GL primitive, vertex count)
+        self.view = np.identity(3, dtype=np.float32)
+
+        # forward compatible contexts (macOS core profiles) only draw 1 pixel wide lines
+        flags = glGetIntegerv(GL_CONTEXT_FLAGS)
+        self.wideLines = not (int(flags) & GL_CONTEXT_FLAG_FORWARD_COMPATIBLE_BIT)
+        self.coreProfile = bool(int(glGetIntegerv(GL_CONTEXT_PROFILE_MASK)) & GL_CONTEXT_CORE_PROFILE_BIT)
+        self.setView(self.view)
+
+    def setView(self, matrix):
+        # the world -> device 3x3 matrix, gl2D passes its glNDCMatrix whenever the view changes
+        self.view = np.ascontiguousarray(matrix, dtype=np.float32)
+        glUseProgram(self.program)
+        glUniformMatrix3fv(self.uniforms['view'], 1, GL_TRUE, self.view)  # NumPy is row major
+        glUseProgram(0)
+
+    def lineWidth(self, width):
+        if width is None: return  # leave it as it is
+        glLineWidth(width if self.wideLines else 1.0)
+
+    def currentColor(self):
+        # what glColor last set, so instanced drawing can be mixed with immediate mode drawing
+        if self.coreProfile: return (0.0, 0.0, 0.0)  # there is no current color
+        return glGetFloatv(GL_CURRENT_COLOR)[:3]
+
+    def drawBuffer(self, vbo, styles, stride=20):
+        # draw a vertex buffer of x, y, r, g, b float32 vertices  (a gl2DBatch)
+        # styles is a list of (GL primitive, line width, first vertex, vertex count)
+        glUseProgram(self.program)
+        glUniform1i(self.uniforms['instanced'], 0)
+        glBindVertexArray(self.vao)
+        glBindBuffer(GL_ARRAY_BUFFER, vbo)
+        glEnableVertexAttribArray(0)
+        glEnableVertexAttribArray(1)
+        glVertexAttribPointer(0, 2, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(0))
+        glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(8))
+        lineWidth = glGetFloatv(GL_LINE_WIDTH)
+        for mode, width, first, count in styles:
+            self.lineWidth(width)
+            glDrawArrays(mode, first, count)
+        glLineWidth(lineWidth)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindVertexArray(0)
+        glUseProgram(0)
+
+    def template(self, key, points):
+        # upload a unit shape once and keep it, with a vertex array object that already knows
+        # where everything is, so drawing copies of it only needs the instance data
+        if key not in self.templates:
+            points, mode = points()
+            vertices = np.ascontiguousarray(points, dtype=np.float32)
+            vao = glGenVertexArrays(1)
+            vbo = glGenBuffers(1)
+            glBindVertexArray(vao)
+            glBindBuffer(GL_ARRAY_BUFFER, vbo)
+            glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+            glEnableVertexAttribArray(0)
+            glVertexAttribPointer(0, 2, GL_FLOAT, GL_FALSE, 0, ctypes.c_void_p(0))
+            glBindBuffer(GL_ARRAY_BUFFER, self.instanceVBO)
+            for location, size, offset in ((2, 2, 0), (3, 1, 8), (4, 1, 12), (1, 3, 16)):  # center, scale, angle, color
+                glEnableVertexAttribArray(location)
+                glVertexAttribPointer(location, size, GL_FLOAT, GL_FALSE, 28, ctypes.c_void_p(offset))
+                glVertexAttribDivisor(location, 1)  # one value per instance
+            glBindVertexArray(0)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+            self.templates[key] = (vao, vbo, mode, len(vertices))
+        return self.templates[key]
+
+    def drawInstances(self, template, x, y, scale=1.0, angle=0.0, color=(0, 0, 0), width=1.0):
+        # one copy of a unit shape (from template()) at each x, y, in ONE draw call
+        # scale, angle (radians) and color may be single values or one per instance
+        # color None uses the current glColor, width None the current line width
+        x, y, scale, angle = np.broadcast_arrays(np.atleast_1d(np.asarray(x, dtype=np.float32)),
+                                                 np.asarray(y, dtype=np.float32),
+                                                 np.asarray(scale, dtype=np.float32),
+                                                 np.asarray(angle, dtype=np.float32))
+        n = len(x)
+        if n == 0: return
+        instances = np.empty((n, 7), dtype=np.float32)  # x, y, scale, angle, r, g, b  (28 bytes)
+        instances[:, 0] = x
+        instances[:, 1] = y
+        instances[:, 2] = scale
+        instances[:, 3] = angle
+        if color is None: color = self.currentColor()
+        instances[:, 4:] = np.asarray(color, dtype=np.float32).reshape(-1, 3)
+
+        vao, vbo, mode, count = template
+        glUseProgram(self.program)
+        glUniform1i(self.uniforms['instanced'], 1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.instanceVBO)
+        glBufferData(GL_ARRAY_BUFFER, instances.nbytes, instances, GL_STREAM_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindVertexArray(vao)
+        if width is not None:
+            lineWidth = glGetFloatv(GL_LINE_WIDTH)
+            self.lineWidth(width)
+        glDrawArraysInstanced(mode, 0, count, n)
+        if width is not None: glLineWidth(lineWidth)
+        glBindVertexArray(0)
+        glUseProgram(0)
+
+    def drawCircles(self, xcenter, ycenter, radius, color=(0, 0, 0), fill=False, faces=24, width=1.0):
+        # any number of circles, like gl2DCircle() but one call for all of them
+        template = self.template(("circle", faces, bool(fill)), lambda: unitCircle(faces, fill))
+        self.drawInstances(template, xcenter, ycenter, radius, 0.0, color, width)
+
+    def drawArrows(self, xtip, ytip, size, angleDeg=0, color=(0, 0, 0), widthDeg=60, toCenter=False,
+                   fill=True, width=1.0):
+        # any number of arrowheads, like gl2DArrow()
+        template = self.template(("arrow", widthDeg, toCenter is True, bool(fill)),
+                                 lambda: unitArrow(widthDeg, toCenter, fill))
+        self.drawInstances(template, xtip, ytip, size, np.radians(angleDeg), color, width)
+
+    def drawJoints(self, x, y, radius, color=(1, 1, 1), edgeColor=(0, 0, 0), edge=0.2, faces=24):
+        # pin joints:  a filled circle with a ring of edgeColor around it
+        # every ring comes before every center, so they are all one draw call
+        x, y, radius = np.broadcast_arrays(np.atleast_1d(np.asarray(x, dtype=np.float32)),
+                                           np.asarray(y, dtype=np.float32),
+                                           np.asarray(radius, dtype=np.float32))
+        n = len(x)
+        colors = np.concatenate((np.broadcast_to(np.asarray(edgeColor, dtype=np.float32).reshape(-1, 3), (n, 3)),
+                                 np.broadcast_to(np.asarray(color, dtype=np.float32).reshape(-1, 3), (n, 3))))
+        template = self.template(("circle", faces, True), lambda: unitCircle(faces, True))
+        self.drawInstances(template, np.tile(x, 2), np.tile(y, 2),
+                           np.concatenate((radius, radius*(1 - edge))), 0.0, colors)
+
+    def delete(self):
+        # free the GPU objects  (needs the GL context to be current)
+        for vao, vbo, mode, count in self.templates.values():
+            glDeleteVertexArrays(1, [vao])
+            glDeleteBuffers(1, [vbo])
+        self.templates = {}
+        glDeleteBuffers(1, [self.instanceVBO])
+        glDeleteVertexArrays(1, [self.vao])
+        glDeleteProgram(self.program)
+        if gl2DShader.current is self: gl2DShader.current = None
@@ -0,0 +1,148 @@
+'''
+Frame timing for the gl2D class
+    Where does a frame's time go?  Once timing is turned on, gl2D records how long each part
+    of every frame takes:
+        callback   the animation callback (solving and moving the data to the next frame)
+        draw       paintGL():  clearing the window and the drawCallback()
+        swap       swapping the window buffers (or glFinish() offscreen), waiting for the GPU
+        poll       handling the window events
+    Only the last `capacity` frames are kept (a ring buffer), so timing can be left on.
+    Idle time between frames (waiting for the next frame to be due) is not part of any frame.
+    In a PyQt window the painting happens after the frame asked for it, and is added to that frame.
+
+        timer = gl2D.glEnableTiming(overlay=True)     # overlay shows the numbers in the window
+        ... run the animation ...
+        timer.fps()                                   # frames per second, over the recorded frames
+        timer.percentiles()                           # {'p50': 4.1, 'p95': 6.3, 'p99': 9.8} frame times in ms
+        timer.percentiles('callback')                 # the same for one phase
+        timer.summary()                               # everything, as a dictionary
+        timer.dumpCSV("timing.csv")                   # one row per frame
+        timer.dumpJSON("timing.json")                 # the summary and every frame
+'''
+
+import json
+from time import perf_counter
+import numpy as np
+
+from OpenGL.GL import *
+
+PHASES = ('callback', 'draw', 'swap', 'poll')
+
+
+class gl2DFrameTimer():
+
+    def __init__(self, capacity=600):
+        self.enabled = False  # nothing is recorded until gl2D.glEnableTiming()
+        self.capacity = capacity
+        # one spare row, so the frame being timed never overwrites a finished frame
+        self.starts = np.zeros(capacity + 1)  # perf_counter() at the start of each frame
+        self.times = np.zeros((capacity + 1, len(PHASES)))  # seconds spent in each phase
+        self.count = 0  # finished frames so far
+        self.current = None  # row of the frame being timed, None between frames
+        self.last = None  # row of the last finished frame
+        self.font = None  # HersheyFont for the overlay, loaded on first use
+
+    def clear(self):
+        self.count = 0
+        self.current = None
+        self.last = None
+
+    @property
+    def inFrame(self):
+        return self.current is not None
+
+    def beginFrame(self):
+        if not self.enabled: return
+        row = self.count % len(self.starts)
+        self.starts[row] = perf_counter()
+        self.times[row] = 0
+        self.current = row
+
+    def add(self, phase, seconds):
+        # add time to a phase of the current frame  (or the last one, for PyQt painting)
+        if not self.enabled: return
+        row = self.current if self.current is not None else self.last
+        if row is None: return
+        self.times[row, PHASES.index(phase)] += seconds
+
+    def endFrame(self):
+        if self.current is None: return
+        self.last = self.current
+        self.current = None
+        self.count += 1
+
+    def frames(self):
+        # (start times, phase times) of the recorded frames, oldest first, in seconds
+        n = min(self.count, self.capacity)
+        rows = np.arange(self.count - n, self.count) % len(self.starts)
+        return self.starts[rows], self.times[rows]
+
+    def frameTimes(self, phase=None):
+        # the time of every recorded frame (all phases) or of one phase, in milliseconds
+        starts, times = self.frames()
+        if phase is None: return times.sum(axis=1)*1000
+        return times[:, PHASES.index(phase)]*1000
+
+    def fps(self):
+        # frames per second, from the start times of the recorded frames
+        starts, times = self.frames()
+        if len(starts) < 2 or starts[-1] <= starts[0]: return 0.0
+        return (len(starts) - 1)/(starts[-1] - starts[0])
+
+    def percentiles(self, phase=None, q=(50, 95, 99)):
+        # frame (or phase) time percentiles in milliseconds, as {'p50': ..., 'p95': ..., 'p99': ...}
+        values = self.frameTimes(phase)
+        if len(values) == 0: return {'p{:g}'.format(p): 0.0 for p in q}
+        return {'p{:g}'.format(p): float(v) for p, v in zip(q, np.percentile(values, q))}
+
+    def summary(self):
+        # fps, and mean, percentiles and max (ms) of the frame time and of every phase
+        starts, times = self.frames()
+        result = {'frames': len(starts), 'fps': self.fps()}
+        for phase in (None,) + PHASES:
+            values = self.frameTimes(phase)
+            stats = {'mean': float(values.mean()) if len(values) else 0.0}
+            stats.update(self.percentiles(phase))
+            stats['max'] = float(values.max()) if len(values) else 0.0
+            result['total' if phase is None else phase] = stats
+        return result
+
+    def dumpCSV(self, filename):
+        # one row per frame:  start time (ms from the first recorded frame), then every phase and the total (ms)
+        starts, times = self.frames()
+        header = ['frame', 'start'] + list(PHASES) + ['total']
+        first = self.count - len(starts)
+        with open(filename, 'w') as f1:
+            f1.write(','.join(header) + '\n')
+            for i, (start, row) in enumerate(zip(starts, times)):
+                values = [(start - starts[0])*1000] + list(row*1000) + [row.sum()*1000]
+                f1.write(','.join([str(first + i)] + ['{:.4f}'.format(v) for v in values]) + '\n')
+
+    def dumpJSON(self, filename):
+        # the summary and every recorded frame (ms)
+        starts, times = self.frames()
+        info = self.summary()
+        info['phases'] = list(PHASES)
+        info['frameStarts'] = ((starts - starts[0])*1000).tolist() if len(starts) else []
+        info['frameTimes'] = (times*1000).tolist()
+        with open(filename, 'w') as f1:
+            json.dump(info, f1, indent=1)
+
+    def overlayLines(self):
+        # the text shown by drawOverlay()
+        p = self.percentiles()
+        lines = ['{:.1f} fps   frame p50 {:.1f}  p95 {:.1f}  p99 {:.1f} ms'.format(self.fps(), p['p50'], p['p95'], p['p99'])]
+        lines.append('   '.join('{} {:.1f}'.format(phase, self.frameTimes(phase).mean() if self.count else 0.0)
+                                for phase in PHASES) + ' ms')
+        return lines
+
+    def drawOverlay(self, x, y, size, color=(1, 1, 0)):
+        # the numbers as text, top left corner at x, y (drawing coordinates), size is the line height
+        if self.font is None:
+            from HersheyFont import HersheyFont
+            self.font = HersheyFont()
+        glPushAttrib(GL_CURRENT_BIT | GL_LINE_BIT)
+        glColor3f(*color)
+        items = [(line, (x, y - (i + 1)*size), size) for i, line in enumerate(self.overlayLines())]
+        self.font.drawTextBatch(items, weight=1)
+        glPopAttrib()
@@ -0,0 +1,75 @@
+'''
+The gl2D view transform, computed with NumPy instead of read back from OpenGL
+    gl2D used to build its view with glOrtho/glTranslatef/glRotatef and then read the matrices
+    back with glGetDoublev() for gluUnProject().  Here the same transform is built as 3x3
+    matrices (2D points in homogeneous x, y, 1 form), so converting between mouse (window)
+    coordinates and world coordinates is plain arithmetic, works on arrays of points,
+    and needs no OpenGL at all.
+
+        ndc, screen = gl2DViewMatrices(800, 600, xmin, xmax, ymin, ymax)
+        ndc      world -> OpenGL normalized device coordinates (-1 to 1), loaded into OpenGL by gl2D
+        screen   world -> window pixels, (0, 0) at the top left like mouse events
+        applyMatrix(np.linalg.inv(screen), mousex, mousey)   # mouse to world
+'''
+
+import numpy as np
+
+
+def translateMatrix(x, y):
+    return np.array([[1.0, 0, x], [0, 1.0, y], [0, 0, 1.0]])
+
+
+def gl2DViewMatrices(windowWidth, windowHeight, xmin, xmax, ymin, ymax, allowDistortion=False,
+                     zoom=1.0, zoomx=0.0, zoomy=0.0, rotate=0.0, rotx=0.0, roty=0.0):
+    # returns the world -> device (ndc) and world -> window pixel (screen) 3x3 matrices
+    # and the viewport (x, y, width, height) used by gl2D
+    width, height = xmax - xmin, ymax - ymin
+    top, bottom, right, left = ymax, ymin, xmax, xmin
+
+    if allowDistortion == False:  # force no shape distortion, just like setupGLviewing
+        windowShape = windowWidth / windowHeight
+        drawingShape = width / height
+        if drawingShape > windowShape:
+            newheight = height * drawingShape / windowShape
+            top = (top + bottom) / 2 + newheight / 2
+            bottom = top - newheight
+        else:
+            newwidth = width * windowShape / drawingShape
+            right = (right + left) / 2 + newwidth / 2
+            left = right - newwidth
+
+    ortho = np.array([[2 / (right - left), 0, -(right + left) / (right - left)],
+                      [0, 2 / (top - bottom), -(top + bottom) / (top - bottom)],
+                      [0, 0, 1.0]])
+
+    # zoom and rotation about their own centers
+    c, s = np.cos(np.radians(rotate)), np.sin(np.radians(rotate))
+    model = (translateMatrix(zoomx, zoomy) @ np.diag([zoom, zoom, 1.0]) @ translateMatrix(-zoomx, -zoomy)
+             @ translateMatrix(rotx, roty) @ np.array([[c, -s, 0], [s, c, 0], [0, 0, 1.0]])
+             @ translateMatrix(-rotx, -roty))
+    ndc = ortho @ model
+
+    # device coordinates to window pixels, with y measured down from the top of the viewport
+    viewport = (1, 1, windowWidth - 1, windowHeight - 1)
+    vx, vy, vw, vh = viewport
+    pixels = np.array([[vw / 2, 0, vx + vw / 2],
+                       [0, -vh / 2, vh - vy - vh / 2],
+                       [0, 0, 1.0]])
+    return ndc, pixels @ ndc, viewport
+
+
+def applyMatrix(matrix, x, y):
+    # transform single x, y values or arrays of them with a 3x3 matrix
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    return (matrix[0, 0]*x + matrix[0, 1]*y + matrix[0, 2],
+            matrix[1, 0]*x + matrix[1, 1]*y + matrix[1, 2])
+
+
+def glMatrix4(matrix):
+    # a 2D 3x3 matrix as the 4x4 column major array that glLoadMatrixd() expects
+    m = np.identity(4)
+    m[2, 2] = -1.0  # z as glOrtho(..., -1, 1) leaves it
+    m[0:2, 0:2] = matrix[0:2, 0:2]
+    m[0:2, 3] = matrix[0:2, 2]
+    return np.ascontiguousarray(m.T)
@@ -0,0 +1,78 @@
+'''
+Rigid body (rotate + move) transforms for many shapes at once
+    All of the shapes that move together (payload outlines, tracepoints, ...) are packed into ONE
+    contiguous (npoints, 2) array when the data file is loaded.  Each frame moves the whole packed
+    array with one matrix multiply, no matter how many shapes or points there are, and every shape
+    is a slice (view) of the result.
+
+    Transforms are 2x3 affine matrices [R | t]:   new point = R @ point + t
+        packed = PackedShapes()
+        i = packed.add(outline)
+        moved = packed.transform(affineMatrix(x, y, theta, xref, yref))
+        moved[packed.slice(i)]                       # the moved outline
+        packed.transformAll(matrices)               # (nframes, npoints, 2) for every frame at once
+        packed.transformAll(matrices, i)            # just the outline, for every frame
+'''
+
+import numpy as np
+
+
+def affineMatrix(xnew, ynew, theta=0, xref=0, yref=0):
+    # rotate by theta about (xref, yref), then move (xref, yref) to (xnew, ynew)
+    # the same transform as transform() in AnimateFourbarClass.py
+    c, s = np.cos(theta), np.sin(theta)
+    return np.array([[c, -s, xnew - (c*xref - s*yref)],
+                     [s, c, ynew - (s*xref + c*yref)]])
+
+
+class PackedShapes():
+
+    def __init__(self):
+        self.parts = []  # the shapes as they are added, packed on first use
+        self.first = np.zeros(0, dtype=np.intp)  # index of the first point of each shape
+        self.count = np.zeros(0, dtype=np.intp)  # number of points in each shape
+        self.points = np.zeros((0, 2))
+        self.out = None  # reused by transform() so moving the shapes allocates nothing
+
+    def __len__(self):
+        return len(self.parts)
+
+    def add(self, points):
+        # add a shape, returns its index
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.parts.append(points)
+        self.count = np.append(self.count, len(points))
+        self.first = np.append(self.first, self.count[:-1].sum())
+        self.points = None  # pack again
+        return len(self.parts) - 1
+
+    def pack(self):
+        if self.points is None:
+            self.points = np.ascontiguousarray(np.concatenate(self.parts)) if self.parts else np.zeros((0, 2))
+            self.out = np.empty_like(self.points)
+        return self.points
+
+    def slice(self, i):
+        return slice(self.first[i], self.first[i] + self.count[i])
+
+    def split(self, points):
+        # the shapes of a packed (..., npoints, 2) array, as a list of views
+        return [points[..., self.first[i]:self.first[i] + self.count[i], :] for i in range(len(self.parts))]
+
+    def transform(self, matrix, out=None):
+        # every packed point moved by one 2x3 matrix, as one (npoints, 2) array
+        # the result is overwritten by the next call unless out is given
+        points = self.pack()
+        if out is None: out = self.out
+        matrix = np.asarray(matrix, dtype=np.float64)
+        np.matmul(points, matrix[:, :2].T, out=out)
+        out += matrix[:, 2]
+        return out
+
+    def transformAll(self, matrices, shape=None):
+        # every packed point for every matrix in an (nframes, 2, 3) array -> (nframes, npoints, 2)
+        # or only the points of one shape
+        points = self.pack()
+        if shape is not None: points = points[self.slice(shape)]
+        matrices = np.asarray(matrices, dtype=np.float64)
+        return np.matmul(points, np.swapaxes(matrices[:, :, :2], 1, 2)) + matrices[:, None, :, 2]
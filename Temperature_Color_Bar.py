@@ -64,49 +64,6 @@ def drawTemperatureColorBar(xmin,xmax,ymin,ymax):
     glEnd()
 
 
-def temperature_to_rgb(temp, t_min, t_max):
-    """
-    Maps a temperature value to an RGB color.
-    Blue = t_min, Green = middle, Red = t_max
-    """
-    if t_min >= t_max:
-        raise ValueError("t_min must be less than t_max")
-
-    # Normalize temperature to range [0, 1]
-    t_norm = (temp - t_min) / (t_max - t_min)
-
-    if t_norm <= 0.25:
-        # Blue (0,0,1) → Cyan (0,1,1)
-        ratio = t_norm / 0.25
-        r = 0.0
-        g = ratio
-        b = 1.0
-
-    elif t_norm <= 0.5:
-        # Cyan (0,1,1) → Green (0,1,0)
-        ratio = (t_norm - 0.25) / 0.25
-        r = 0.0
-        g = 1.0
-        b = 1.0 - ratio
-
-    elif t_norm <= 0.75:
-        # Green (0,1,0) → Yellow (1,1,0)
-        ratio = (t_norm - 0.5) / 0.25
-        r = ratio
-        g = 1.0
-        b = 0.0
-
-    else:
-        # Yellow (1,1,0) → Red (1,0,0)
-        ratio = (t_norm - 0.75) / 0.25
-        r = 1.0
-        g = 1.0 - ratio
-        b = 0.0
-
-    return (r, g, b)
-
-
-
 def main():
     glutInit()
     glutInitDisplayMode(GLUT_RGBA | GLUT_DOUBLE | GLUT_ALPHA | GLUT_DEPTH)
@@ -0,0 +1,31 @@
+'''
+Reads exported files back to check what the viewer will see
+'''
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ExportAnimation import frameWriter
+
+
+@pytest.mark.parametrize("fps", [10, 30])
+def test_gif_frame_duration(tmp_path, fps):
+    pytest.importorskip("imageio")
+    Image = pytest.importorskip("PIL.Image")
+    output = str(tmp_path / "animation.gif")
+    writer = frameWriter(output, fps)
+    for i in range(4):
+        writer.append(np.full((16, 16, 3), i*60, dtype=np.uint8))
+    writer.close()
+
+    gif = Image.open(output)
+    assert gif.n_frames == 4
+    for i in range(gif.n_frames):
+        gif.seek(i)
+        # GIF delays are stored in hundredths of a second
+        assert abs(gif.info["duration"] - 1000.0/fps) < 10